@@ -0,0 +1,80 @@
+"""Login throughput for bcrypt verification: request threadpool vs the passwords process pool.
+
+    python benchmarks/bench_password_hashing.py --logins 200 --concurrency 32 --rounds 12
+
+Prints one JSON object with logins/sec overall and per core for each mode, plus
+the worst event-loop stall observed while the burst was running.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def measure_stall(stop: asyncio.Event):
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.001)
+        worst = max(worst, time.perf_counter() - started - 0.001)
+    return worst
+
+
+async def burst(verify, hashed, logins, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await verify("correct horse battery staple", hashed)
+
+    stop = asyncio.Event()
+    stall = asyncio.create_task(measure_stall(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    return elapsed, await stall
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    os.environ["PASSWORD_WORKERS"] = str(args.workers)
+    os.environ["PASSWORD_QUEUE_LIMIT"] = str(args.logins)
+    import passwords
+    from fastapi.concurrency import run_in_threadpool
+
+    hashed = passwords.pwd_context.hash("correct horse battery staple")
+    cores = os.cpu_count() or 1
+
+    async def threadpool_verify(password, hashed_password):
+        return await run_in_threadpool(passwords.pwd_context.verify, password, hashed_password)
+
+    # Start the worker processes outside the timed region.
+    await asyncio.gather(*(passwords.verify_password("warmup", hashed) for _ in range(args.workers)))
+
+    results = {"rounds": args.rounds, "logins": args.logins, "concurrency": args.concurrency, "cores": cores, "workers": args.workers}
+    for mode, verify in (("threadpool", threadpool_verify), ("process_pool", passwords.verify_password)):
+        elapsed, stall = await burst(verify, hashed, args.logins, args.concurrency)
+        results[mode] = {
+            "seconds": round(elapsed, 3),
+            "logins_per_sec": round(args.logins / elapsed, 1),
+            "logins_per_sec_per_core": round(args.logins / elapsed / cores, 2),
+            "max_event_loop_stall_ms": round(stall * 1000, 2)
+        }
+    passwords.shutdown_executor()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""Matching new listings to saved searches: every search per listing vs the SearchIndex buckets in services/saved_searches.py.
+
+    python benchmarks/bench_saved_searches.py --searches 100000 --listings 2000
+
+"scan path" runs the exact predicate against every saved search, as a
+straightforward implementation would. "index path" is SearchIndex.match. Both
+must find the same searches. No database is needed; data is synthetic.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.saved_searches import SearchIndex, search_matches
+
+PROPERTY_TYPES = ["Flat", "Duplex", "Bungalow", "Self Contain", "Terrace"]
+PURPOSES = ["Rent", "Sale", "Shortlet"]
+AREAS = ["Lekki", "Yaba", "Ikeja", "Surulere", "Ajah", "Gbagada", "Victoria Island", "Magodo"]
+
+
+def make_searches(count, rng):
+    searches = []
+    for n in range(count):
+        low = rng.choice([None, rng.randrange(100_000, 10_000_000, 50_000)])
+        high = rng.choice([None, (low or 0) + rng.randrange(200_000, 5_000_000, 50_000)])
+        searches.append({
+            "id": n + 1,
+            "user_email": f"user{n % 5000}@example.com",
+            "name": f"search {n + 1}",
+            "min_price": low,
+            "max_price": high,
+            "bedroom_no": rng.choice([None, str(rng.randint(1, 5))]),
+            "property_type": rng.choice([None, *PROPERTY_TYPES]),
+            "purpose": rng.choice([None, *PURPOSES]),
+            "location": rng.choice([None, *AREAS]),
+        })
+    return searches
+
+
+def make_listings(count, rng):
+    return [
+        {
+            "id": n + 1,
+            "price": rng.randrange(150_000, 20_000_000, 10_000),
+            "bedroom_no": str(rng.randint(1, 6)),
+            "property_type": rng.choice(PROPERTY_TYPES),
+            "purpose": rng.choice(PURPOSES),
+            "address": f"{rng.randint(1, 200)} Some Street, {rng.choice(AREAS)}, Lagos",
+        }
+        for n in range(count)
+    ]
+
+
+def timed(listings, func):
+    started = time.perf_counter()
+    results = [sorted(search["id"] for search in func(listing)) for listing in listings]
+    return (time.perf_counter() - started) / len(listings), results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--searches", type=int, default=100000)
+    parser.add_argument("--listings", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    searches = make_searches(args.searches, rng)
+    listings = make_listings(args.listings, rng)
+    index = SearchIndex()
+    started = time.perf_counter()
+    for search in searches:
+        index.add(search)
+    build_seconds = time.perf_counter() - started
+
+    scan_seconds, scan_results = timed(listings, lambda listing: [search for search in searches if search_matches(search, listing)])
+    index_seconds, index_results = timed(listings, index.match)
+    assert scan_results == index_results, "paths disagree"
+
+    print(json.dumps({
+        "searches": args.searches,
+        "listings": args.listings,
+        "build_seconds": round(build_seconds, 3),
+        "buckets": len(index.buckets),
+        "matches_per_listing": round(sum(map(len, index_results)) / len(listings), 1),
+        "scan_ms_per_listing": round(scan_seconds * 1000, 3),
+        "index_ms_per_listing": round(index_seconds * 1000, 3),
+        "speedup": round(scan_seconds / index_seconds, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Rows/sec for building listing serialization: pydantic models vs dict rows + orjson.
+
+    python benchmarks/bench_serialization.py --rows 20000 --repeat 5
+
+"model path" reproduces what the listing did before: build a BuildingDisplay per
+tuple row, then let FastAPI validate the response_model and run jsonable_encoder
+and json.dumps. "orjson path" is the current one: dict rows from psycopg's
+dict_row encoded straight to bytes. No database is needed; rows are synthetic.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson
+from pydantic import TypeAdapter
+from fastapi.encoders import jsonable_encoder
+from schema.home_schema import BuildingDisplay, BuildingPage
+from services.buildings import BUILDING_FIELDS
+
+
+def make_rows(count):
+    return [
+        (i, f"Spacious {i % 5 + 1} bedroom flat with parking", f"{i} Herbert Macaulay Way, Yaba, Lagos",
+         str(i % 5 + 1), str(i % 3 + 1), "Furnished", "Borehole, Generator, Security",
+         "POP ceiling, Tiled floors", "Parking space, Fence", "Rent", 250000 + i, 12, "Flat", 6.5095, 3.3711,
+         ["borehole", "generator", "parking", "pop_ceiling", "security", "tiled_floors"])
+        for i in range(count)
+    ]
+
+
+def model_path(rows, page_adapter):
+    items = [BuildingDisplay(**dict(zip(BUILDING_FIELDS, row))) for row in rows]
+    page = page_adapter.validate_python({"items": items, "next_cursor": None})
+    return json.dumps(jsonable_encoder(page_adapter.dump_python(page, mode="json"))).encode()
+
+
+def orjson_path(rows):
+    items = [dict(zip(BUILDING_FIELDS, row)) for row in rows]
+    return orjson.dumps({"items": items, "next_cursor": None})
+
+
+def best_of(repeat, func, *args):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    page_adapter = TypeAdapter(BuildingPage)
+    assert json.loads(model_path(rows[:10], page_adapter)) == json.loads(orjson_path(rows[:10]))
+
+    results = {"rows": args.rows}
+    for name, seconds in (
+        ("model_path", best_of(args.repeat, model_path, rows, page_adapter)),
+        ("orjson_path", best_of(args.repeat, orjson_path, rows)),
+    ):
+        results[name] = {"seconds": round(seconds, 4), "rows_per_sec": round(args.rows / seconds)}
+    results["speedup"] = round(results["model_path"]["seconds"] / results["orjson_path"]["seconds"], 1)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Top-k similar listings: per-row Python scoring vs the NumPy feature matrix in services/similar.py.
+
+    python benchmarks/bench_similar.py --rows 100000 --queries 200 --k 10
+
+"loop path" scores every listing against the query with the same weighted
+distance in plain Python, as a straightforward implementation would. "matrix
+path" is SimilarListings.top_k. Both must return the same ids. No database is
+needed; listings are synthetic.
+"""
+import os
+import sys
+import json
+import time
+import heapq
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.similar import SimilarListings
+
+PROPERTY_TYPES = ["Flat", "Duplex", "Bungalow", "Self Contain", "Terrace"]
+PURPOSES = ["Rent", "Sale", "Shortlet"]
+FURNISHED = ["Furnished", "Semi Furnished", "Unfurnished"]
+AMENITIES = ["borehole", "generator", "security", "parking", "swimming_pool", "gym", "prepaid_meter", "cctv"]
+
+
+def make_rows(count, rng):
+    return [
+        {
+            "id": n + 1,
+            "price": rng.randrange(150_000, 20_000_000, 10_000),
+            "bedroom_no": str(rng.randint(1, 6)),
+            "bathroom_no": str(rng.randint(1, 4)),
+            "property_type": rng.choice(PROPERTY_TYPES),
+            "purpose": rng.choice(PURPOSES),
+            "furnished": rng.choice(FURNISHED),
+            "amenities": sorted(rng.sample(AMENITIES, rng.randint(1, 4))),
+        }
+        for n in range(count)
+    ]
+
+
+def loop_path(vectors, ids, query_position, k):
+    query = vectors[query_position]
+    scored = (
+        (sum((a - b) ** 2 for a, b in zip(vector, query)), id)
+        for position, (vector, id) in enumerate(zip(vectors, ids))
+        if position != query_position
+    )
+    return [id for _, id in heapq.nsmallest(k, scored)]
+
+
+def timed(queries, func):
+    started = time.perf_counter()
+    results = [func(query) for query in queries]
+    return (time.perf_counter() - started) / len(queries), results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--loop-queries", type=int, default=3, help="the Python loop is slow; time it on fewer queries")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = SimilarListings()
+    started = time.perf_counter()
+    index.upsert(make_rows(args.rows, rng))
+    load_seconds = time.perf_counter() - started
+    queries = [rng.randrange(1, args.rows + 1) for _ in range(args.queries)]
+
+    matrix_seconds, matrix_results = timed(queries, lambda id: index.top_k(id, args.k))
+    vectors = index.matrix[:index.size].tolist()
+    ids = index.ids[:index.size].tolist()
+    loop_queries = queries[:args.loop_queries]
+    loop_seconds, loop_results = timed(loop_queries, lambda id: loop_path(vectors, ids, index.positions[id], args.k))
+    # Equal distances may tie-break differently; compare as sets.
+    assert all(set(a) == set(b) for a, b in zip(loop_results, matrix_results)), "paths disagree"
+
+    print(json.dumps({
+        "rows": args.rows,
+        "k": args.k,
+        "load_seconds": round(load_seconds, 3),
+        "loop_ms_per_query": round(loop_seconds * 1000, 2),
+        "matrix_ms_per_query": round(matrix_seconds * 1000, 3),
+        "speedup": round(loop_seconds / matrix_seconds, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
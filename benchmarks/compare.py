@@ -0,0 +1,75 @@
+"""Diff two load_test.py reports.
+
+    python benchmarks/compare.py results/base.json results/HEAD.json --fail-over 10
+
+Prints one row per route and concurrency level with the p50/p95/p99 and
+throughput change in percent. With --fail-over, the exit status is 1 when any
+p95 grows, or any throughput drops, by more than that percentage.
+"""
+import sys
+import json
+import argparse
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "rps")
+
+
+def change(before, after):
+    if not before or after is None:
+        return None
+    return round((after - before) / before * 100, 1)
+
+
+def compare(base, head):
+    rows = []
+    for route, levels in head["results"].items():
+        for concurrency, after in levels.items():
+            before = base["results"].get(route, {}).get(concurrency)
+            if before is None:
+                continue
+            rows.append({
+                "route": route,
+                "concurrency": int(concurrency),
+                **{metric: {"base": before[metric], "head": after[metric], "change_pct": change(before[metric], after[metric])} for metric in METRICS},
+                "errors": {"base": before["errors"], "head": after["errors"]},
+            })
+    return rows
+
+
+def regressed(row, threshold):
+    p95 = row["p95_ms"]["change_pct"]
+    rps = row["rps"]["change_pct"]
+    return (p95 is not None and p95 > threshold) or (rps is not None and rps < -threshold)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--fail-over", type=float, help="regression threshold in percent")
+    parser.add_argument("--json", action="store_true", help="print the comparison as JSON")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+    rows = compare(base, head)
+
+    if args.json:
+        print(json.dumps({"base": base.get("commit"), "head": head.get("commit"), "rows": rows}, indent=2))
+    else:
+        print(f"{base.get('commit')} -> {head.get('commit')}")
+        print(f"{'route':<10}{'conc':>6}" + "".join(f"{metric:>22}" for metric in METRICS))
+        for row in rows:
+            cells = "".join(
+                f"{row[metric]['head']:>12} ({row[metric]['change_pct']:+.1f}%)" if row[metric]["change_pct"] is not None else f"{str(row[metric]['head']):>22}"
+                for metric in METRICS
+            )
+            print(f"{row['route']:<10}{row['concurrency']:>6}{cells}")
+
+    if args.fail_over is not None and any(regressed(row, args.fail_over) for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
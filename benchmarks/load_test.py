@@ -0,0 +1,232 @@
+"""Fixed-concurrency load test for the main API routes, run against seeded data.
+
+    python benchmarks/load_test.py --concurrency 1,8,32 --requests 500 --out results/HEAD.json
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --routes listing,saved --duration 20
+
+Without --url the app from main.py is driven in-process over httpx's ASGI
+transport (lifespan included), which measures the app and database but not
+the HTTP server. Accounts come from seed.py. For each route and concurrency
+level the output records p50/p95/p99/mean latency in milliseconds, requests
+per second and error count, plus the commit it ran against, so two files can
+be diffed with compare.py.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import httpx
+
+LISTING_QUERIES = [
+    {},
+    {"property_type": "Flat"},
+    {"purpose": "Rent", "furnished": "Furnished"},
+    {"bedroom_no": "3"},
+    {"min_price": 500000, "max_price": 3000000},
+]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies.sort()
+    ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+    }
+
+
+class Scenario:
+    def __init__(self, client, tokens, building_ids, password, rng):
+        self.client = client
+        self.tokens = tokens
+        self.building_ids = building_ids
+        self.password = password
+        self.rng = rng
+
+    def auth(self):
+        return {"Authorization": f"Bearer {self.rng.choice(self.tokens)}"}
+
+    async def listing(self):
+        return await self.client.get("/buildings/", params={**self.rng.choice(LISTING_QUERIES), "limit": 20})
+
+    async def nearby(self):
+        # Around Yaba, the densest seeded cluster (see seed.AREAS); rounded so the listing cache sees repeats.
+        params = {"lat": round(6.5095 + self.rng.uniform(-0.02, 0.02), 3), "lng": round(3.3711 + self.rng.uniform(-0.02, 0.02), 3), "radius_km": 2, "limit": 20}
+        return await self.client.get("/buildings/nearby", params=params)
+
+    async def save(self):
+        return await self.client.post(f"/buildings/save/{self.rng.choice(self.building_ids)}", headers=self.auth())
+
+    async def saved(self):
+        return await self.client.get("/buildings/saved", headers=self.auth())
+
+    async def login(self):
+        email = f"bench-user-{self.rng.randrange(len(self.tokens))}@example.com"
+        return await self.client.post("/auth/login", json={"username": email, "password": self.password})
+
+    async def me(self):
+        return await self.client.get("/users/me", headers=self.auth())
+
+
+ROUTES = ("listing", "nearby", "save", "saved", "login", "me")
+
+
+async def run_level(call, concurrency, requests, duration):
+    latencies = []
+    errors = 0
+    issued = 0
+    deadline = time.perf_counter() + duration if duration else None
+
+    async def worker():
+        nonlocal errors, issued
+        while True:
+            if deadline is not None:
+                if time.perf_counter() >= deadline:
+                    return
+            elif issued >= requests:
+                return
+            issued += 1
+            started = time.perf_counter()
+            try:
+                response = await call()
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def wait_ready(client, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while (await client.get("/readyz")).status_code != 200:
+        if time.perf_counter() > deadline:
+            raise SystemExit("app did not become ready")
+        await asyncio.sleep(0.2)
+
+
+async def login_tokens(client, count, password):
+    tokens = []
+    for n in range(count):
+        response = await client.post("/auth/login", json={"username": f"bench-user-{n}@example.com", "password": password})
+        response.raise_for_status()
+        tokens.append(response.json()["access_token"])
+    return tokens
+
+
+async def building_ids(client):
+    response = await client.get("/buildings/", params={"limit": 100})
+    response.raise_for_status()
+    return [item["id"] for item in response.json()["items"]]
+
+
+async def benchmark(client, args):
+    rng = random.Random(args.seed)
+    await wait_ready(client)
+    tokens = await login_tokens(client, args.accounts, args.password)
+    scenario = Scenario(client, tokens, await building_ids(client), args.password, rng)
+
+    results = {}
+    for route in args.routes:
+        call = getattr(scenario, route)
+        # Warm caches, prepared statements and pool connections before measuring.
+        await run_level(call, max(args.concurrency), args.warmup, 0)
+        results[route] = {}
+        for concurrency in args.concurrency:
+            results[route][str(concurrency)] = await run_level(call, concurrency, args.requests, args.duration)
+            print(f"{route} c={concurrency}: {results[route][str(concurrency)]}", file=sys.stderr)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main_async(args):
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+            return await benchmark(client, args)
+
+    from main import app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            return await benchmark(client, args)
+
+
+def csv_list(cast):
+    return lambda value: [cast(item) for item in value.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--routes", type=csv_list(str), default=list(ROUTES))
+    parser.add_argument("--concurrency", type=csv_list(int), default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=500, help="requests per route and concurrency level")
+    parser.add_argument("--duration", type=float, default=0, help="seconds per level; overrides --requests")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--accounts", type=int, default=20, help="seeded user accounts to log in as")
+    parser.add_argument("--password", default="benchpass")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    unknown = set(args.routes) - set(ROUTES)
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+
+    results = asyncio.run(main_async(args))
+    report = {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "target": args.url or "in-process",
+        "python": platform.python_version(),
+        "settings": {
+            "requests": args.requests,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "accounts": args.accounts,
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Fill a local Postgres with synthetic Users, Buildings, saved_buildings and OTPs for load testing.
+
+    python benchmarks/seed.py --users 5000 --landlords 200 --buildings 100000 --saved-per-user 10 --otps 20000
+
+Connects with the same env vars as database.py. Seeded accounts are
+bench-user-<n>@example.com and bench-landlord-<n>@example.com, all with the
+password given by --password, so load_test.py can log in as any of them.
+Rows are written with COPY; --reset deletes earlier bench rows first. Prints
+one JSON object with the row counts and how long each table took.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg
+from database import CONNINFO
+from passwords import pwd_context
+from services.amenities import extract_amenities
+
+PROPERTY_TYPES = ["Flat", "Duplex", "Bungalow", "Self Contain", "Terrace"]
+PURPOSES = ["Rent", "Sale", "Shortlet"]
+FURNISHED = ["Furnished", "Semi Furnished", "Unfurnished"]
+# Approximate centre of each area; listings are scattered a couple of km around it,
+# which gives /buildings/nearby the dense clusters it has to stay fast on.
+AREAS = {
+    "Yaba": (6.5095, 3.3711), "Lekki": (6.4474, 3.4723), "Ikeja": (6.6018, 3.3515),
+    "Surulere": (6.5000, 3.3500), "Ajah": (6.4698, 3.5852), "Gbagada": (6.5535, 3.3873),
+    "Wuse": (9.0765, 7.4683), "Garki": (9.0333, 7.4833), "Bodija": (7.4326, 3.9110), "GRA": (4.8156, 7.0498),
+}
+FACILITIES = ["Borehole", "Generator", "Security", "Parking", "Swimming Pool", "Gym", "Prepaid Meter", "CCTV"]
+
+
+def user_email(kind, n):
+    return f"bench-{kind}-{n}@example.com"
+
+
+def reset(conn):
+    conn.execute("DELETE FROM saved_buildings WHERE user_email LIKE 'bench-%@example.com'")
+    conn.execute("DELETE FROM OTPs WHERE email LIKE 'bench-%@example.com'")
+    conn.execute("DELETE FROM Buildings WHERE description LIKE 'Bench listing %'")
+    conn.execute("DELETE FROM Users WHERE email LIKE 'bench-%@example.com'")
+
+
+def seed_users(conn, users, landlords, hashed_password):
+    with conn.cursor().copy("COPY Users (full_name, email, phone_number, account_type, subscribed, hashed_password) FROM STDIN") as copy:
+        for n in range(users):
+            copy.write_row((f"Bench User {n}", user_email("user", n), f"080{n:08d}", "User", False, hashed_password))
+        for n in range(landlords):
+            copy.write_row((f"Bench Landlord {n}", user_email("landlord", n), f"081{n:08d}", "Landlord", False, hashed_password))
+
+
+def seed_buildings(conn, count, landlords, rng):
+    columns = "description, address, bedroom_no, bathroom_no, furnished, available_facilities, interior_features, exterior_features, purpose, price, payment_frequency, property_type, latitude, longitude, amenities, owner_email"
+    with conn.cursor().copy(f"COPY Buildings ({columns}) FROM STDIN") as copy:
+        for n in range(count):
+            bedrooms = rng.randint(1, 6)
+            property_type = rng.choice(PROPERTY_TYPES)
+            area = rng.choice(list(AREAS))
+            lat, lng = AREAS[area]
+            facilities = ", ".join(rng.sample(FACILITIES, rng.randint(1, 4)))
+            copy.write_row((
+                f"Bench listing {n}: {bedrooms} bedroom {property_type.lower()} in {area}",
+                f"{rng.randint(1, 200)} Bench Street, {area}",
+                str(bedrooms),
+                str(rng.randint(1, bedrooms)),
+                rng.choice(FURNISHED),
+                facilities,
+                "Tiled floors, POP ceiling",
+                "Fenced compound",
+                rng.choice(PURPOSES),
+                rng.randrange(150_000, 20_000_000, 10_000),
+                12,
+                property_type,
+                round(lat + rng.uniform(-0.02, 0.02), 6),
+                round(lng + rng.uniform(-0.02, 0.02), 6),
+                extract_amenities(facilities, "Tiled floors, POP ceiling", "Fenced compound"),
+                user_email("landlord", rng.randrange(landlords)) if landlords else None
+            ))
+    cursor = conn.execute("SELECT id FROM Buildings WHERE description LIKE 'Bench listing %'")
+    return [row[0] for row in cursor]
+
+
+def seed_saved(conn, users, per_user, building_ids, rng):
+    written = 0
+    with conn.cursor().copy("COPY saved_buildings (user_email, building_id) FROM STDIN") as copy:
+        for n in range(users):
+            for building_id in rng.sample(building_ids, min(per_user, len(building_ids))):
+                copy.write_row((user_email("user", n), building_id))
+                written += 1
+    return written
+
+
+def seed_otps(conn, count, users, rng):
+    now = datetime.utcnow()
+    with conn.cursor().copy("COPY OTPs (email, otp, created_at, expires_at, is_used) FROM STDIN") as copy:
+        for _ in range(count):
+            created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 7))
+            copy.write_row((user_email("user", rng.randrange(users)), f"{rng.randint(0, 999999):06d}",
+                            created_at, created_at + timedelta(minutes=5), rng.random() < 0.7))
+
+
+def timed(timings, name, func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    timings[name] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--landlords", type=int, default=50)
+    parser.add_argument("--buildings", type=int, default=20000)
+    parser.add_argument("--saved-per-user", type=int, default=10)
+    parser.add_argument("--otps", type=int, default=5000)
+    parser.add_argument("--password", default="benchpass")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--reset", action="store_true", help="delete rows from earlier seed runs first")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # One hash for every account; hashing per user would dominate seeding time.
+    hashed_password = pwd_context.hash(args.password)
+    timings = {}
+    with psycopg.connect(CONNINFO) as conn:
+        if args.reset:
+            timed(timings, "reset", reset, conn)
+        timed(timings, "users", seed_users, conn, args.users, args.landlords, hashed_password)
+        building_ids = timed(timings, "buildings", seed_buildings, conn, args.buildings, args.landlords, rng)
+        saved = timed(timings, "saved_buildings", seed_saved, conn, args.users, args.saved_per_user, building_ids, rng) if building_ids else 0
+        if args.users:
+            timed(timings, "otps", seed_otps, conn, args.otps, args.users, rng)
+        timed(timings, "analyze", conn.execute, "ANALYZE Users, Buildings, saved_buildings, OTPs")
+
+    print(json.dumps({
+        "rows": {
+            "users": args.users + args.landlords,
+            "buildings": len(building_ids),
+            "saved_buildings": saved,
+            "otps": args.otps if args.users else 0
+        },
+        "seconds": timings
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,22 @@
 import os
-from psycopg2.pool import ThreadedConnectionPool
-import psycopg2
+import re
+import math
 import time
+import asyncio
+import logging
+import traceback
+import psycopg
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+from starlette.requests import cookie_parser
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool, PoolTimeout, TooManyRequests
 from dotenv import load_dotenv
+from functools import lru_cache
+from cachetools import TTLCache
+from metrics import Histogram, histogram_family, counter_family, current_timing
 
 load_dotenv()
 
@@ -11,43 +25,483 @@ PASSWORD = os.getenv("password")
 HOST = os.getenv("host")
 PORT = os.getenv("port")
 DBNAME = os.getenv("dbname")
-db_pool = None
 
-def init_db_connection(max_retries=5, initial_delay=2):
-    """Initialize a ThreadedConnectionPool for PostgreSQL."""
-    global db_pool
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "20"))
+# Seconds a request may wait for a free connection before giving up.
+POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "10"))
+# Statements executed this many times on a connection are prepared server-side.
+# Set DB_PREPARE_THRESHOLD=-1 to disable (e.g. behind pgbouncer in transaction mode).
+PREPARE_THRESHOLD = int(os.getenv("DB_PREPARE_THRESHOLD", "5"))
+PREPARED_MAX = int(os.getenv("DB_PREPARED_MAX", "100"))
+# Requests queued for a connection beyond this are rejected immediately (0 = unbounded).
+POOL_MAX_WAITING = int(os.getenv("DB_POOL_MAX_WAITING", "100"))
+# Checkouts held longer than this many seconds are reported as probable leaks.
+LEAK_THRESHOLD = float(os.getenv("DB_LEAK_THRESHOLD", "30"))
+# Startup keeps retrying the first connection, backing off up to this many seconds between attempts.
+STARTUP_RETRY_MAX = float(os.getenv("DB_STARTUP_RETRY_MAX", "30"))
+STARTUP_PROBE_TIMEOUT = float(os.getenv("DB_STARTUP_PROBE_TIMEOUT", "5"))
+READY_PROBE_TIMEOUT = float(os.getenv("DB_READY_PROBE_TIMEOUT", "1"))
+
+# Optional streaming replica for read-only queries (see get_read_connection); unset REPLICA_HOST to read from the primary.
+REPLICA_HOST = os.getenv("REPLICA_HOST")
+REPLICA_PORT = os.getenv("REPLICA_PORT", PORT)
+REPLICA_USER = os.getenv("REPLICA_USER", USER)
+REPLICA_PASSWORD = os.getenv("REPLICA_PASSWORD", PASSWORD)
+REPLICA_DBNAME = os.getenv("REPLICA_DBNAME", DBNAME)
+REPLICA_POOL_MIN_SIZE = int(os.getenv("REPLICA_POOL_MIN_SIZE", "2"))
+REPLICA_POOL_MAX_SIZE = int(os.getenv("REPLICA_POOL_MAX_SIZE", "20"))
+# A replica checkout that takes longer than this goes to the primary instead.
+REPLICA_ACQUIRE_TIMEOUT = float(os.getenv("REPLICA_ACQUIRE_TIMEOUT", "0.5"))
+# Reads move to the primary while the replica's replay is more than this many seconds behind.
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "2"))
+# A client's reads skip the per-worker caches and go to the primary for this many seconds after
+# its own last write on any worker, as do reads keyed by something written on this worker. Keep
+# it above REPLICA_MAX_LAG so the write has replicated by the time reads return to the replica.
+READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", "10"))
+# Carries the time of a client's last write between requests; clients that cannot keep cookies
+# (cross-site fetches) can echo the X-Last-Write response header instead.
+LAST_WRITE_COOKIE = os.getenv("LAST_WRITE_COOKIE", "last_write")
+LAST_WRITE_HEADER = "x-last-write"
+
+logger = logging.getLogger(__name__)
+
+query_duration = histogram_family("db_query_duration_seconds", "SQL statement latency by normalized query.", ("query",))
+query_rows = counter_family("db_query_rows_total", "Rows returned or affected by normalized query.", ("query",))
+query_errors = counter_family("db_query_errors_total", "Failed SQL statements by normalized query.", ("query",))
+
+SELECT_LIST = re.compile(r"^(\s*SELECT\s).+?(\sFROM\s)", re.IGNORECASE | re.DOTALL)
+
+
+@lru_cache(maxsize=1024)
+def normalize_query(query: str):
+    """Collapse whitespace and the leading select list so each statement shape gets one metric label."""
+    return SELECT_LIST.sub(r"\1...\2", " ".join(query.split()), count=1)[:300]
+
+
+def query_label(query):
+    if isinstance(query, bytes):
+        query = query.decode()
+    if isinstance(query, str):
+        return normalize_query(query)
+    return type(query).__name__
+
+
+class TimedCursor(psycopg.AsyncCursor):
+    """Cursor that records latency, row counts and errors for every statement it runs."""
+
+    def record(self, query, started, failed):
+        elapsed = time.perf_counter() - started
+        label = query_label(query)
+        query_duration.labels(label).observe(elapsed)
+        if failed:
+            query_errors.labels(label).inc()
+        elif self.rowcount > 0:
+            query_rows.labels(label).inc(self.rowcount)
+        timing = current_timing.get()
+        if timing is not None:
+            timing.db += elapsed
+            timing.queries += 1
+
+    async def execute(self, query, params=None, **kwargs):
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = await super().execute(query, params, **kwargs)
+            failed = False
+            return result
+        finally:
+            self.record(query, started, failed)
+
+    async def executemany(self, query, params_seq, **kwargs):
+        started = time.perf_counter()
+        failed = True
+        try:
+            await super().executemany(query, params_seq, **kwargs)
+            failed = False
+        finally:
+            self.record(query, started, failed)
+
+
+async def configure_connection(conn: psycopg.AsyncConnection):
+    conn.prepare_threshold = PREPARE_THRESHOLD if PREPARE_THRESHOLD >= 0 else None
+    conn.prepared_max = PREPARED_MAX
+
+
+CONNINFO = make_conninfo(
+    user=USER,
+    password=PASSWORD,
+    host=HOST,
+    port=PORT,
+    dbname=DBNAME,
+    options="-c idle_in_transaction_session_timeout=10min"
+)
+
+db_pool = AsyncConnectionPool(
+    CONNINFO,
+    min_size=POOL_MIN_SIZE,
+    max_size=POOL_MAX_SIZE,
+    timeout=POOL_ACQUIRE_TIMEOUT,
+    max_waiting=POOL_MAX_WAITING,
+    kwargs={"autocommit": True, "cursor_factory": TimedCursor},
+    configure=configure_connection,
+    open=False
+)
+
+replica_pool = AsyncConnectionPool(
+    make_conninfo(
+        user=REPLICA_USER,
+        password=REPLICA_PASSWORD,
+        host=REPLICA_HOST,
+        port=REPLICA_PORT,
+        dbname=REPLICA_DBNAME,
+        options="-c default_transaction_read_only=on"
+    ),
+    min_size=REPLICA_POOL_MIN_SIZE,
+    max_size=REPLICA_POOL_MAX_SIZE,
+    timeout=REPLICA_ACQUIRE_TIMEOUT,
+    max_waiting=POOL_MAX_WAITING,
+    kwargs={"autocommit": True, "cursor_factory": TimedCursor},
+    configure=configure_connection,
+    open=False
+) if REPLICA_HOST else None
+
+
+class Checkout:
+    __slots__ = ("started", "stack")
+
+    def __init__(self):
+        self.started = time.monotonic()
+        # Skip this frame and the contextmanager machinery so the stack ends at the caller.
+        self.stack = traceback.extract_stack(limit=12)[:-3]
+
+    def age(self):
+        return time.monotonic() - self.started
+
+    def format_stack(self):
+        return [f"{frame.filename}:{frame.lineno} in {frame.name}" for frame in self.stack]
+
+
+class PoolMetrics:
+    def __init__(self):
+        # Set once the pool has served its first connection after startup.
+        self.ready = False
+        self.wait_time = Histogram()
+        self.waiting = 0
+        self.timeouts = 0
+        self.leaks_reported = 0
+        self.active: dict[int, Checkout] = {}
+
+    def leaked_checkouts(self, threshold=LEAK_THRESHOLD):
+        return [checkout for checkout in self.active.values() if checkout.age() > threshold]
+
+    def snapshot(self):
+        stats = db_pool.get_stats()
+        return {
+            "ready": self.ready,
+            "size": stats.get("pool_size", 0),
+            "max_size": stats.get("pool_max", POOL_MAX_SIZE),
+            "in_use": len(self.active),
+            "idle": stats.get("pool_available", 0),
+            "waiting": self.waiting,
+            "timeouts": self.timeouts,
+            "wait_time_seconds": self.wait_time.snapshot(),
+            "leaks_reported": self.leaks_reported,
+            "leaked_checkouts": [
+                {"age_seconds": round(checkout.age(), 3), "stack": checkout.format_stack()}
+                for checkout in self.leaked_checkouts()
+            ]
+        }
+
+
+pool_metrics = PoolMetrics()
+
+
+@asynccontextmanager
+async def get_connection():
+    """Borrow a pooled connection for the duration of the block; it is always returned.
+
+    Raises a 503 instead of queueing forever when no connection frees up within
+    DB_POOL_ACQUIRE_TIMEOUT seconds or DB_POOL_MAX_WAITING requests are already queued,
+    and straight away while the pool is still warming up.
+    """
+    if not pool_metrics.ready:
+        raise HTTPException(status_code=503, detail="Database unavailable, please retry", headers={"Retry-After": "5"})
+    pool_metrics.waiting += 1
+    started = time.perf_counter()
+    try:
+        conn = await db_pool.getconn()
+    except (PoolTimeout, TooManyRequests):
+        pool_metrics.timeouts += 1
+        raise HTTPException(status_code=503, detail="Database busy, please retry", headers={"Retry-After": "1"})
+    finally:
+        pool_metrics.waiting -= 1
+        waited = time.perf_counter() - started
+        pool_metrics.wait_time.observe(waited)
+        timing = current_timing.get()
+        if timing is not None:
+            timing.pool_wait += waited
+
+    checkout = Checkout()
+    pool_metrics.active[id(checkout)] = checkout
+    try:
+        yield conn
+    finally:
+        del pool_metrics.active[id(checkout)]
+        if checkout.age() > LEAK_THRESHOLD:
+            pool_metrics.leaks_reported += 1
+            logger.warning("Connection held for %.1fs, checked out at:\n%s", checkout.age(), "\n".join(checkout.format_stack()))
+        await db_pool.putconn(conn)
+
+
+# Replay lag in seconds. A replica that has replayed everything it received from a live
+# WAL stream is current even if the primary has been idle since its last transaction.
+REPLICA_LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+        AND EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN 0
+    ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 'Infinity')
+END::float8
+"""
+
+
+class ReplicaMonitor:
+    """Tracks whether the read replica is reachable and within REPLICA_MAX_LAG, probing every REPLICA_CHECK_INTERVAL seconds."""
+
+    def __init__(self):
+        self.available = False
+        self.lag = None
+        self.reason = "not configured" if replica_pool is None else "starting"
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.task = None
+
+    def mark_down(self, reason: str):
+        if self.available:
+            logger.warning("Routing reads to the primary: %s", reason)
+        self.available = False
+        self.reason = reason
+
+    async def check(self):
+        try:
+            async with replica_pool.connection(timeout=READY_PROBE_TIMEOUT) as conn:
+                cursor = await conn.execute(REPLICA_LAG_QUERY)
+                (self.lag,) = await cursor.fetchone()
+        except (PoolTimeout, psycopg.Error) as e:
+            self.lag = None
+            self.mark_down(str(e) or type(e).__name__)
+            return
+        if self.lag > REPLICA_MAX_LAG:
+            self.mark_down(f"replica is {self.lag:.1f}s behind")
+        elif not self.available:
+            logger.info("Routing reads to the replica (%.1fs behind)", self.lag)
+            self.available = True
+            self.reason = None
+
+    async def run(self):
+        await replica_pool.open(wait=False)
+        while True:
+            try:
+                await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Replica check failed")
+                self.lag = None
+                self.mark_down(str(e) or type(e).__name__)
+            await asyncio.sleep(REPLICA_CHECK_INTERVAL)
+
+    def snapshot(self):
+        stats = replica_pool.get_stats() if replica_pool is not None else {}
+        return {
+            "available": self.available,
+            # JSON has no Infinity: the lag is unknown until the replica replays a transaction.
+            "lag_seconds": self.lag if self.lag is None or math.isfinite(self.lag) else None,
+            "reason": self.reason,
+            "size": stats.get("pool_size", 0),
+            "idle": stats.get("pool_available", 0),
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+        }
+
+    def start(self):
+        if replica_pool is not None and self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+            self.available = False
+            await replica_pool.close()
+
+
+replica_monitor = ReplicaMonitor()
+# Keys (user emails, or a scope such as all listings) written on this worker recently.
+recent_writes = TTLCache(maxsize=100_000, ttl=READ_YOUR_WRITES_WINDOW)
+
+
+class LastWrite:
+    """The current client's last write time: as sent with the request, then as updated by mark_write."""
+
+    def __init__(self, at: float | None):
+        self.at = at
+        self.wrote = False
+
+    def recent(self):
+        # A forged or skewed time in the future pins the client for at most one more window.
+        return self.at is not None and abs(time.time() - self.at) < READ_YOUR_WRITES_WINDOW
+
+
+current_last_write: ContextVar[LastWrite | None] = ContextVar("current_last_write", default=None)
+
+
+def mark_write(*keys: str):
+    """Pin reads of keys on this worker, and all reads by the current client on any worker, to
+    the primary for READ_YOUR_WRITES_WINDOW seconds; call after a write they must see."""
+    for key in keys:
+        recent_writes[key] = True
+    last_write = current_last_write.get()
+    if last_write is not None:
+        last_write.at = time.time()
+        last_write.wrote = True
+
+
+def wrote_recently():
+    """Whether the current client wrote within READ_YOUR_WRITES_WINDOW; its reads, cached ones
+    included, must then come from the primary."""
+    last_write = current_last_write.get()
+    return last_write is not None and last_write.recent()
+
+
+def parse_last_write(value: str | None):
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class ReadYourWritesMiddleware:
+    """ASGI middleware carrying read-your-writes stickiness with the client, so it holds across workers.
+
+    A response to a request that called mark_write sets the last_write cookie and the
+    X-Last-Write header to the write time; a request that sends either back within
+    READ_YOUR_WRITES_WINDOW has its get_read_connection reads served by the primary
+    and skips the per-worker caches (see wrote_recently), which another worker's
+    write doesn't invalidate.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        sent = headers.get(LAST_WRITE_HEADER) or cookie_parser(headers.get("cookie", "")).get(LAST_WRITE_COOKIE)
+        last_write = LastWrite(parse_last_write(sent))
+        token = current_last_write.set(last_write)
+
+        async def send_with_last_write(message):
+            if message["type"] == "http.response.start" and last_write.wrote:
+                value = f"{last_write.at:.3f}"
+                cookie = f"{LAST_WRITE_COOKIE}={value}; path=/; Max-Age={math.ceil(READ_YOUR_WRITES_WINDOW)}; httponly; samesite=lax"
+                message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie.encode()), (LAST_WRITE_HEADER.encode(), value.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_last_write)
+        finally:
+            current_last_write.reset(token)
+
+
+@asynccontextmanager
+async def get_read_connection(*keys: str):
+    """Borrow a connection for read-only queries.
+
+    Served from the replica while it is up and within REPLICA_MAX_LAG, unless the
+    client wrote within READ_YOUR_WRITES_WINDOW seconds (see ReadYourWritesMiddleware)
+    or one of keys was passed to mark_write on this worker within that window;
+    otherwise, or when no replica connection frees up within REPLICA_ACQUIRE_TIMEOUT,
+    from the primary through get_connection.
+    """
+    conn = None
+    pinned = wrote_recently() or any(key in recent_writes for key in keys)
+    if replica_monitor.available and not pinned:
+        started = time.perf_counter()
+        try:
+            conn = await replica_pool.getconn()
+        except (PoolTimeout, TooManyRequests):
+            pass
+        finally:
+            timing = current_timing.get()
+            if timing is not None:
+                timing.pool_wait += time.perf_counter() - started
+    if conn is None:
+        replica_monitor.primary_reads += 1
+        async with get_connection() as conn:
+            yield conn
+        return
+    replica_monitor.replica_reads += 1
+    try:
+        yield conn
+    except psycopg.OperationalError as e:
+        # The replica went away mid-query; later reads go to the primary until a probe succeeds.
+        replica_monitor.mark_down(str(e) or type(e).__name__)
+        raise HTTPException(status_code=503, detail="Database unavailable, please retry", headers={"Retry-After": "1"})
+    finally:
+        await replica_pool.putconn(conn)
+
+
+async def init_db_connection(initial_delay=1):
+    """Open the pool without waiting for it, then retry until Postgres answers and mark it ready.
+
+    Meant to run as a background task: the app starts serving (and answering
+    probes) immediately, while the pool fills in the background.
+    """
+    await db_pool.open(wait=False)
     attempt = 0
     delay = initial_delay
-    while attempt < max_retries:
+    while True:
+        attempt += 1
         try:
-            db_pool = ThreadedConnectionPool(
-                minconn=1, 
-                maxconn=10,  
-                user=USER,
-                password=PASSWORD,
-                host=HOST,
-                port=PORT,
-                dbname=DBNAME,
-                options="-c idle_in_transaction_session_timeout=10min" 
-            )
-            conn = db_pool.getconn()
-            conn.autocommit = True
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1")
-            cursor.fetchall()
-            cursor.close()
-            db_pool.putconn(conn)
+            async with db_pool.connection(timeout=STARTUP_PROBE_TIMEOUT) as conn:
+                await conn.execute("SELECT 1")
+            pool_metrics.ready = True
+            logger.info("Database pool ready after %s attempt(s)", attempt)
             return db_pool
-        except psycopg2.OperationalError as e:
-            attempt += 1
-            if attempt == max_retries:
-                raise Exception("Unable to initialize database pool")
-            time.sleep(delay)
-            delay *= 2
-        except Exception as e:
-            raise
-
-try:
-    db_pool = init_db_connection()
-except Exception as e:
-    raise
\ No newline at end of file
+        except (PoolTimeout, psycopg.OperationalError) as e:
+            logger.warning("Database not reachable (attempt %s): %s; retrying in %.0fs", attempt, e or type(e).__name__, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, STARTUP_RETRY_MAX)
+
+
+async def check_ready():
+    """Return (ready, details) for the readiness probe."""
+    stats = db_pool.get_stats()
+    details = {"size": stats.get("pool_size", 0), "idle": stats.get("pool_available", 0), "in_use": len(pool_metrics.active)}
+    if not pool_metrics.ready:
+        return False, {**details, "reason": "starting"}
+    # Every connection busy means the database is answering; failing the probe here would
+    # pull a loaded worker out of rotation and push its traffic onto the others.
+    if details["idle"] == 0 and details["size"] >= POOL_MAX_SIZE:
+        return True, details
+    try:
+        async with db_pool.connection(timeout=READY_PROBE_TIMEOUT) as conn:
+            await conn.execute("SELECT 1")
+    except (PoolTimeout, psycopg.OperationalError) as e:
+        return False, {**details, "reason": str(e) or type(e).__name__}
+    return True, details
+
+
+async def close_db_connection():
+    pool_metrics.ready = False
+    await db_pool.close()
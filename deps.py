@@ -1,9 +1,13 @@
 import os
+import time
+import logging
 import jwt
-from database import db_pool
+from cachetools import TTLCache
+from pydantic import ValidationError
+from database import get_read_connection, mark_write
+from metrics import span
 from datetime import datetime, timedelta, timezone
 from schema.user_schema import User
-from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException, status
 from typing import Annotated
@@ -17,29 +21,77 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
+# Upper bound on how long a role or subscription change goes unnoticed. invalidate_user only
+# clears the cache of the worker that made the change; every other worker keeps its cached
+# User until this many seconds after caching it.
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+# When enabled, login tokens carry the user's profile so a cold cache can be filled without a query.
+# Only safe with a single worker: invalidations are per process, so other workers trust the
+# embedded claims for the token's whole lifetime (ACCESS_TOKEN_EXPIRE_MINUTES). Keep it off
+# until invalidations are shared between workers.
+EMBED_USER_CLAIMS = os.getenv("JWT_EMBED_USER_CLAIMS", "false").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger(__name__)
+if EMBED_USER_CLAIMS:
+    logger.warning("JWT_EMBED_USER_CLAIMS is on: with more than one worker, user changes can go unseen for up to %s minutes", ACCESS_TOKEN_EXPIRE_MINUTES)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token", auto_error=False)
+
+# Per-process cache of authenticated users keyed by email. Entries expire after
+# USER_CACHE_TTL seconds and the least recently used are evicted beyond USER_CACHE_SIZE.
+# Not shared between workers; see USER_CACHE_TTL.
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+# Emails whose row changed recently, with the time of the change. Claims embedded in
+# tokens issued before that time are ignored. Kept for as long as a token can live.
+# Per process too, so only the worker that made the change ignores stale claims.
+user_invalidations = TTLCache(maxsize=USER_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+def row_to_user(row):
+    return User(
+        id = row[0],
+        full_name = row[1],
+        email = row[2],
+        phone_number = row[3],
+        account_type = row[4],
+        subscribed = row[5]
+    )
 
-def get_user(username: str):
-    conn = db_pool.getconn()
-    conn.autocommit = True
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM Users WHERE email = %s",(username,))
-    user = cursor.fetchone()
-    cursor.close()
-    db_pool.putconn(conn)
+async def get_user(username: str):
+    async with get_read_connection(username) as conn:
+        # Runs on every authenticated request: always use a server-side prepared statement.
+        cursor = await conn.execute("SELECT * FROM Users WHERE email = %s", (username,), prepare=True)
+        user = await cursor.fetchone()
     if user:
-        user = User(
-            id = user[0],
-            full_name = user[1],
-            email = user[2],
-            phone_number = user[3],
-            account_type = user[4],
-            subscribed = user[5]
-        )
+        return row_to_user(user)
 
-        return user
+def invalidate_user(email: str):
+    """Drop a cached user; call whenever their Users row is inserted or updated.
+
+    Affects this worker only: other workers see the change once their cached entry
+    expires (USER_CACHE_TTL) and, with JWT_EMBED_USER_CLAIMS, once the token expires.
+    """
+    user_cache.pop(email, None)
+    user_invalidations[email] = time.time()
+    mark_write(email)
+
+def identity_claims(row):
+    if not EMBED_USER_CLAIMS:
+        return {}
+    return {"usr": row_to_user(row).model_dump(mode="json")}
+
+def user_from_claims(payload: dict):
+    claims = payload.get("usr")
+    if not claims:
+        return None
+    invalidated_at = user_invalidations.get(payload["sub"])
+    if invalidated_at and payload.get("iat", 0) < invalidated_at:
+        return None
+    try:
+        return User(**claims)
+    except ValidationError:
+        return None
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
@@ -47,7 +99,7 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": int(time.time())})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -58,7 +110,8 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        with span("jwt"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username = payload.get("sub")
         if username is None:
             raise credentials_exception
@@ -66,10 +119,24 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
     except InvalidTokenError:
         raise credentials_exception
     
-    user = get_user(token_data.username)
+    user = user_cache.get(token_data.username)
+    if user is not None:
+        return user
+
+    with span("user_lookup"):
+        user = user_from_claims(payload) or await get_user(token_data.username)
     if user is None:
         raise credentials_exception
+    user_cache[token_data.username] = user
     return user
 
-def hash_password(password):
-    return pwd_context.hash(password)
\ No newline at end of file
+async def get_optional_user(token: Annotated[str | None, Depends(optional_oauth2_scheme)]):
+    """Like get_current_user, but anonymous or invalid credentials resolve to None instead of a 401."""
+    if token is None:
+        return None
+    try:
+        return await get_current_user(token)
+    except HTTPException as e:
+        if e.status_code == status.HTTP_401_UNAUTHORIZED:
+            return None
+        raise
@@ -1,19 +1,72 @@
 import os
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
 from dotenv import load_dotenv
+import metrics
+from database import init_db_connection, close_db_connection, check_ready, pool_metrics, replica_monitor, query_duration, query_rows, query_errors, ReadYourWritesMiddleware, LAST_WRITE_HEADER
+from passwords import shutdown_executor
+from services.email_outbox import email_outbox
+from services.otp_store import otp_store
+from services.google_oauth import google_oauth
+from services.media import thumbnail_queue
+from services.similar import similar_listings
+from services.saved_searches import search_alerts
+from response_cache import listing_cache
 from routers.buildings import buildingrouter
 from routers.users import usersrouter
+from routers.media import mediarouter
+from routers.saved_searches import searchrouter
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 
-app = FastAPI()
+async def start_after_db():
+    await init_db_connection()
+    replica_monitor.start()
+    email_outbox.start()
+    otp_store.start()
+    similar_listings.start()
+    search_alerts.start()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Don't block startup on Postgres: /healthz answers at once and /readyz once the pool is warm.
+    startup = asyncio.create_task(start_after_db())
+    yield
+    startup.cancel()
+    try:
+        await startup
+    except asyncio.CancelledError:
+        pass
+    await search_alerts.stop()
+    await similar_listings.stop()
+    await otp_store.stop()
+    await email_outbox.stop()
+    thumbnail_queue.shutdown()
+    await google_oauth.close()
+    shutdown_executor()
+    await replica_monitor.stop()
+    await close_db_connection()
+
+app = FastAPI(lifespan=lifespan)
 
 load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY")
+# Adds a Server-Timing header (db, pool wait, auth spans) to every response; exposes internals, so off by default.
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() in ("1", "true", "yes")
+# Serves the /debug/* endpoints, which are unauthenticated and expose internals (checkout stack traces); off by default.
+DEBUG_ENDPOINTS = os.getenv("DEBUG_ENDPOINTS", "false").lower() in ("1", "true", "yes")
+
+
+def debug_endpoints_enabled():
+    if not DEBUG_ENDPOINTS:
+        raise HTTPException(status_code=404, detail="Not Found")
 
 
 app.add_middleware(SessionMiddleware, secret_key=SECRET_KEY)
+app.add_middleware(ReadYourWritesMiddleware)
 
 origins = [
     "http://localhost:3000",
@@ -23,6 +76,8 @@ origins = [
 
 app.include_router(usersrouter,tags=["users"])
 app.include_router(buildingrouter,prefix="/buildings",tags=["buildings"])
+app.include_router(mediarouter,prefix="/media",tags=["media"])
+app.include_router(searchrouter,prefix="/saved-searches",tags=["saved searches"])
 
 app.add_middleware(
     CORSMiddleware,
@@ -30,9 +85,73 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[LAST_WRITE_HEADER],
 )
 
+# Added last so it wraps every other middleware and times the whole request.
+app.add_middleware(metrics.TimingMiddleware, server_timing=SERVER_TIMING)
+
 @app.get('/')
 def home():
     return {"message": "welcome to RentPal"}
 
+@app.get('/healthz', include_in_schema=False)
+def healthz():
+    return {"status": "ok"}
+
+@app.get('/readyz', include_in_schema=False)
+async def readyz():
+    ready, details = await check_ready()
+    return JSONResponse({"status": "ready" if ready else "unavailable", **details}, status_code=200 if ready else 503)
+
+@app.get('/debug/pool', include_in_schema=False, dependencies=[Depends(debug_endpoints_enabled)])
+def pool_status():
+    return {**pool_metrics.snapshot(), "replica": replica_monitor.snapshot()}
+
+@app.get('/debug/cache', include_in_schema=False, dependencies=[Depends(debug_endpoints_enabled)])
+def cache_status():
+    return {"version": listing_cache.version, "entries": len(listing_cache.entries), "hits": listing_cache.hits, "misses": listing_cache.misses}
+
+@app.get('/debug/outbox', include_in_schema=False, dependencies=[Depends(debug_endpoints_enabled)])
+async def outbox_status():
+    return await email_outbox.stats()
+
+@app.get('/metrics', response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics():
+    pool = pool_metrics.snapshot()
+    try:
+        pending, oldest_pending = await email_outbox.pending()
+        outbox_pending = [
+            metrics.gauge("email_outbox_pending", "Emails waiting for delivery or a retry (all workers).", pending),
+            metrics.gauge("email_outbox_oldest_pending_seconds", "Age of the oldest email still waiting.", oldest_pending),
+        ]
+    except HTTPException:
+        # The database is unreachable; still serve the in-process metrics.
+        outbox_pending = []
+    body = metrics.render(
+        metrics.request_duration,
+        metrics.request_count,
+        metrics.span_duration,
+        query_duration,
+        query_rows,
+        query_errors,
+        metrics.gauge("db_pool_size", "Open connections in the pool.", pool["size"]),
+        metrics.gauge("db_pool_in_use", "Connections checked out.", pool["in_use"]),
+        metrics.gauge("db_pool_waiting", "Requests waiting for a connection.", pool["waiting"]),
+        metrics.counter("db_pool_timeouts_total", "Checkouts rejected with a 503.", pool_metrics.timeouts),
+        metrics.histogram("db_pool_wait_seconds", "Time spent waiting for a pooled connection.", pool_metrics.wait_time),
+        metrics.gauge("db_replica_available", "1 while reads are routed to the replica.", int(replica_monitor.available)),
+        metrics.gauge("db_replica_lag_seconds", "Replay lag at the last replica probe.", replica_monitor.lag or 0),
+        metrics.counter("db_replica_reads_total", "Read-only checkouts served by the replica.", replica_monitor.replica_reads),
+        metrics.counter("db_primary_reads_total", "Read-only checkouts sent to the primary (no replica, lagging, or recent write).", replica_monitor.primary_reads),
+        metrics.counter("response_cache_hits_total", "Listing response cache hits.", listing_cache.hits),
+        metrics.counter("response_cache_misses_total", "Listing response cache misses.", listing_cache.misses),
+        metrics.gauge("similar_listings_rows", "Listings held in the similar-listings feature matrix.", similar_listings.size),
+        metrics.gauge("saved_search_streams", "Users with an open saved-search match stream.", len(search_alerts.subscribers)),
+        *outbox_pending,
+        metrics.counter("email_outbox_sent_total", "Emails delivered by this worker.", email_outbox.sent),
+        metrics.counter("email_outbox_retried_total", "Failed deliveries scheduled for another attempt.", email_outbox.retried),
+        metrics.counter("email_outbox_failed_total", "Emails given up on after OUTBOX_MAX_ATTEMPTS.", email_outbox.failed),
+        metrics.histogram("email_outbox_delivery_seconds", "Time from enqueue to delivery.", email_outbox.delivery_latency),
+    )
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
@@ -0,0 +1,209 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (seconds), updated from the event loop."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def snapshot(self):
+        return {
+            "buckets": {("+Inf" if bound == float("inf") else str(bound)): count for bound, count in self.cumulative()},
+            "count": self.count,
+            "sum": self.sum
+        }
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{value}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Family:
+    """A named metric split by label values, rendered in the Prometheus text format.
+
+    Series beyond max_series are folded into one whose label values are all
+    "other", so an unexpected label value can't grow memory without bound.
+    """
+
+    def __init__(self, name, help, kind, labelnames=(), factory=Counter, max_series=500):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.factory = factory
+        self.max_series = max_series
+        self.series = {}
+
+    def labels(self, *values):
+        series = self.series.get(values)
+        if series is None:
+            if len(self.series) >= self.max_series:
+                values = ("other",) * len(self.labelnames)
+                series = self.series.get(values)
+            if series is None:
+                series = self.series[values] = self.factory()
+        return series
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, series in self.series.items():
+            if isinstance(series, Histogram):
+                for bound, count in series.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{self.name}_bucket{format_labels(self.labelnames, values, [('le', le)])} {count}")
+                lines.append(f"{self.name}_count{format_labels(self.labelnames, values)} {series.count}")
+                lines.append(f"{self.name}_sum{format_labels(self.labelnames, values)} {series.sum}")
+            else:
+                lines.append(f"{self.name}{format_labels(self.labelnames, values)} {series.value}")
+        return lines
+
+
+def histogram_family(name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return Family(name, help, "histogram", labelnames, lambda: Histogram(buckets))
+
+
+def counter_family(name, help, labelnames=()):
+    return Family(name, help, "counter", labelnames)
+
+
+def gauge(name, help, value):
+    return [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {value}"]
+
+
+def counter(name, help, value):
+    return [f"# HELP {name} {help}", f"# TYPE {name} counter", f"{name} {value}"]
+
+
+def histogram(name, help, histogram: Histogram):
+    """Render an existing unlabelled Histogram."""
+    family = Family(name, help, "histogram")
+    family.series[()] = histogram
+    return family.render()
+
+
+def render(*sections):
+    """Join Family objects and pre-rendered line lists into one exposition body."""
+    lines = []
+    for section in sections:
+        lines.extend(section.render() if isinstance(section, Family) else section)
+    return "\n".join(lines) + "\n"
+
+
+class RequestTiming:
+    """Time spent in each phase of one request, for the Server-Timing header."""
+
+    __slots__ = ("started", "db", "queries", "pool_wait", "spans")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db = 0.0
+        self.queries = 0
+        self.pool_wait = 0.0
+        self.spans = {}
+
+    def header(self):
+        parts = [
+            f'db;dur={self.db * 1000:.2f};desc="{self.queries} queries"',
+            f"pool;dur={self.pool_wait * 1000:.2f}",
+        ]
+        parts += [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.spans.items()]
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.2f}")
+        return ", ".join(parts)
+
+
+current_timing: ContextVar[RequestTiming | None] = ContextVar("current_timing", default=None)
+
+span_duration = histogram_family("app_span_duration_seconds", "Time spent in named sections of request handling.", ("span",))
+
+
+@contextmanager
+def span(name: str):
+    """Time a block into app_span_duration_seconds and the current request's Server-Timing."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        span_duration.labels(name).observe(elapsed)
+        timing = current_timing.get()
+        if timing is not None:
+            timing.spans[name] = timing.spans.get(name, 0.0) + elapsed
+
+
+request_duration = histogram_family("http_request_duration_seconds", "Request latency by route template, until the last body chunk is sent.", ("method", "route"))
+request_count = counter_family("http_requests_total", "Responses by route template and status code.", ("method", "route", "status"))
+
+
+class TimingMiddleware:
+    """ASGI middleware recording per-route latency and, optionally, a Server-Timing header.
+
+    The header is built when the response starts, so for streamed responses it
+    covers the work done before the first byte.
+    """
+
+    def __init__(self, app, server_timing=False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", timing.header().encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_timing.reset(token)
+            # The router stores the matched route in scope; its path template keeps label cardinality bounded.
+            route = scope.get("route")
+            label = getattr(route, "path", "unmatched")
+            request_duration.labels(scope["method"], label).observe(time.perf_counter() - timing.started)
+            request_count.labels(scope["method"], label, str(status)).inc()
@@ -0,0 +1,206 @@
+"""Versioned schema migrations and a query-plan check for the hot paths.
+
+    python migrate.py up        # apply pending files in migrations/, in name order
+    python migrate.py status    # list applied and pending migrations
+    python migrate.py explain   # EXPLAIN each known query, flag sequential scans
+
+Each file in migrations/ runs once, inside its own transaction, and is recorded in
+schema_migrations with a checksum so later edits to an applied file are reported.
+Files are plain SQL, or Python modules defining upgrade(conn) for data migrations
+that need application code; conn is a psycopg connection inside that transaction.
+An advisory lock keeps concurrent deploys from applying the same file twice.
+"""
+import os
+import sys
+import json
+import hashlib
+import argparse
+import importlib.util
+from datetime import datetime
+import psycopg
+from psycopg.rows import dict_row
+from database import CONNINFO
+from services.buildings import BUILDING_COLUMNS, BUILDING_COLUMNS_B, HAVERSINE_KM
+from services.otp_store import OTP_MAX_ATTEMPTS, VERIFY_OTP
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+# Arbitrary constant shared by every migrate.py process.
+LOCK_ID = 727_001
+
+# (name, SQL, parameter builder) for the statements services/ and deps.py run per request
+# or per background batch. Keep in step with the code when a query changes shape.
+HOT_QUERIES = [
+    ("get_user", "SELECT * FROM Users WHERE email = %s", lambda s: (s["email"],)),
+    ("listing_first_page", f"SELECT {BUILDING_COLUMNS} FROM Buildings ORDER BY id DESC LIMIT %s", lambda s: (21,)),
+    ("listing_next_page", f"SELECT {BUILDING_COLUMNS} FROM Buildings WHERE id < %s ORDER BY id DESC LIMIT %s", lambda s: (s["building_id"], 21)),
+    ("listing_by_type", f"SELECT {BUILDING_COLUMNS} FROM Buildings WHERE purpose = %s AND property_type = %s AND furnished = %s ORDER BY id DESC LIMIT %s",
+     lambda s: (s["purpose"], s["property_type"], s["furnished"], 21)),
+    ("listing_by_rooms", f"SELECT {BUILDING_COLUMNS} FROM Buildings WHERE bedroom_no = %s ORDER BY id DESC LIMIT %s", lambda s: (s["bedroom_no"], 21)),
+    ("listing_by_price", f"SELECT {BUILDING_COLUMNS} FROM Buildings WHERE price >= %s AND price <= %s ORDER BY id DESC LIMIT %s", lambda s: (s["price"], s["price"], 21)),
+    ("listing_by_amenities", f"SELECT {BUILDING_COLUMNS} FROM Buildings WHERE amenities @> %s::text[] ORDER BY id DESC LIMIT %s", lambda s: (s["common_amenities"], 21)),
+    ("listing_by_rare_amenities", f"WITH matches AS MATERIALIZED (SELECT {BUILDING_COLUMNS} FROM Buildings WHERE amenities @> %s::text[]) SELECT * FROM matches ORDER BY id DESC LIMIT %s",
+     lambda s: (s["rare_amenities"], 21)),
+    ("listing_by_any_amenity", f"SELECT {BUILDING_COLUMNS} FROM Buildings WHERE amenities && %s::text[] ORDER BY id DESC LIMIT %s", lambda s: (s["common_amenities"], 21)),
+    ("buildings_by_id", f"SELECT {BUILDING_COLUMNS} FROM Buildings WHERE id = ANY(%s)", lambda s: ([s["building_id"]],)),
+    ("search", f"SELECT {BUILDING_COLUMNS} FROM Buildings, websearch_to_tsquery('english', %s) query WHERE search_vector @@ query ORDER BY ts_rank_cd(search_vector, query) DESC, id DESC LIMIT %s",
+     lambda s: ("flat parking", 20)),
+    ("nearby_knn", f"SELECT max(distance_km), count(*) FROM (SELECT {HAVERSINE_KM} AS distance_km FROM Buildings WHERE point(longitude, latitude) <@ box(point(%s, %s), point(%s, %s)) ORDER BY point(longitude, latitude) <-> point(%s, %s) LIMIT %s) knn",
+     lambda s: (s["latitude"], s["latitude"], s["longitude"], s["longitude"] - 0.05, s["latitude"] - 0.05, s["longitude"] + 0.05, s["latitude"] + 0.05, s["longitude"], s["latitude"], 20)),
+    ("nearby", f"SELECT * FROM (SELECT {BUILDING_COLUMNS}, {HAVERSINE_KM} AS distance_km FROM Buildings WHERE point(longitude, latitude) <@ box(point(%s, %s), point(%s, %s))) nearby WHERE distance_km <= %s ORDER BY distance_km, id DESC LIMIT %s",
+     lambda s: (s["latitude"], s["latitude"], s["longitude"], s["longitude"] - 0.002, s["latitude"] - 0.002, s["longitude"] + 0.002, s["latitude"] + 0.002, 0.2, 20)),
+    ("saved_list", f"SELECT {BUILDING_COLUMNS_B} FROM Buildings b JOIN saved_buildings sb ON b.id = sb.building_id WHERE sb.user_email = %s", lambda s: (s["email"],)),
+    ("mark_saved", "SELECT building_id FROM saved_buildings WHERE user_email = %s AND building_id = ANY(%s)", lambda s: (s["email"], [s["building_id"]])),
+    ("unsave", "DELETE FROM saved_buildings WHERE user_email = %s AND building_id = %s", lambda s: (s["email"], s["building_id"])),
+    ("otp_verify", VERIFY_OTP, lambda s: {"email": s["email"], "otp": "000000", "now": datetime.utcnow(), "max_attempts": OTP_MAX_ATTEMPTS}),
+    ("otp_sweep", "SELECT ctid FROM OTPs WHERE expires_at < now() LIMIT %s", lambda s: (5000,)),
+    ("outbox_claim", "SELECT id FROM email_outbox WHERE sent_at IS NULL AND failed_at IS NULL AND next_attempt_at <= now() ORDER BY next_attempt_at LIMIT %s", lambda s: (50,)),
+]
+
+
+def migration_files():
+    return sorted(name for name in os.listdir(MIGRATIONS_DIR) if name.endswith((".sql", ".py")))
+
+
+def checksum(sql: str):
+    return hashlib.sha256(sql.encode()).hexdigest()
+
+
+def read(name):
+    with open(os.path.join(MIGRATIONS_DIR, name)) as f:
+        return f.read()
+
+
+def run_python(conn, name):
+    spec = importlib.util.spec_from_file_location(f"migrations.{name[:-3]}", os.path.join(MIGRATIONS_DIR, name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.upgrade(conn)
+
+
+def ensure_table(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            name TEXT PRIMARY KEY,
+            checksum TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """
+    )
+
+
+def applied(conn):
+    return {name: digest for name, digest in conn.execute("SELECT name, checksum FROM schema_migrations")}
+
+
+def up(conn):
+    conn.execute("SELECT pg_advisory_lock(%s)", (LOCK_ID,))
+    try:
+        ensure_table(conn)
+        done = applied(conn)
+        for name in migration_files():
+            if name in done:
+                continue
+            sql = read(name)
+            with conn.transaction():
+                if name.endswith(".py"):
+                    run_python(conn, name)
+                else:
+                    conn.execute(sql)
+                conn.execute("INSERT INTO schema_migrations (name, checksum) VALUES (%s, %s)", (name, checksum(sql)))
+            print(f"applied {name}")
+    finally:
+        conn.execute("SELECT pg_advisory_unlock(%s)", (LOCK_ID,))
+
+
+def status(conn):
+    ensure_table(conn)
+    done = applied(conn)
+    for name in migration_files():
+        if name not in done:
+            state = "pending"
+        elif done[name] != checksum(read(name)):
+            state = "applied, file changed since"
+        else:
+            state = "applied"
+        print(f"{name}: {state}")
+    for name in sorted(set(done) - set(migration_files())):
+        print(f"{name}: applied, file missing")
+
+
+def sample_values(conn):
+    """Real values from the data, so the planner sees realistic selectivity."""
+    cursor = conn.cursor(row_factory=dict_row)
+    building = cursor.execute(
+        "SELECT id AS building_id, purpose, property_type, furnished, bedroom_no, price, coalesce(latitude, 0) AS latitude, coalesce(longitude, 0) AS longitude FROM Buildings ORDER BY id DESC LIMIT 1"
+    ).fetchone() or {"building_id": 0, "purpose": "", "property_type": "", "furnished": "", "bedroom_no": "", "price": 0, "latitude": 0, "longitude": 0}
+    user = cursor.execute("SELECT email FROM Users ORDER BY id LIMIT 1").fetchone() or {"email": ""}
+    amenities = cursor.execute(
+        "SELECT coalesce((array_agg(term ORDER BY listings DESC))[1:1], '{}') AS common_amenities,"
+        " coalesce((array_agg(term ORDER BY listings))[1:1], '{}') AS rare_amenities FROM amenity_counts WHERE listings > 0"
+    ).fetchone()
+    return {**building, **user, **amenities}
+
+
+def seq_scans(plan, min_rows):
+    """Yield (relation, estimated rows) for every Seq Scan node over a table with more than min_rows rows."""
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") and plan.get("_table_rows", 0) > min_rows:
+        yield plan["Relation Name"], plan["_table_rows"]
+    for child in plan.get("Plans", []):
+        yield from seq_scans(child, min_rows)
+
+
+def annotate_table_rows(conn, plan):
+    relation = plan.get("Relation Name")
+    if relation:
+        row = conn.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)", (relation,)).fetchone()
+        plan["_table_rows"] = max(row[0], 0) if row else 0
+    for child in plan.get("Plans", []):
+        annotate_table_rows(conn, child)
+
+
+def explain(conn, min_rows, analyze, verbose):
+    samples = sample_values(conn)
+    flagged = 0
+    for name, sql, params in HOT_QUERIES:
+        options = "FORMAT JSON, ANALYZE, BUFFERS" if analyze else "FORMAT JSON"
+        # ANALYZE executes the statement; roll back so the DELETE probes leave no trace.
+        with conn.transaction(force_rollback=True):
+            (result,) = conn.execute(f"EXPLAIN ({options}) {sql}", params(samples)).fetchone()
+        plan = result[0]["Plan"]
+        annotate_table_rows(conn, plan)
+        scans = list(seq_scans(plan, min_rows))
+        flagged += bool(scans)
+        summary = f"{name}: {plan['Node Type']}, cost {plan['Total Cost']}"
+        if analyze:
+            summary += f", {result[0]['Execution Time']:.2f} ms"
+        if scans:
+            summary += "  SEQ SCAN on " + ", ".join(f"{relation} (~{rows} rows)" for relation, rows in scans)
+        print(summary)
+        if verbose:
+            print(json.dumps(plan, indent=2))
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("up")
+    sub.add_parser("status")
+    explain_parser = sub.add_parser("explain")
+    explain_parser.add_argument("--min-rows", type=int, default=1000, help="ignore sequential scans of smaller tables")
+    explain_parser.add_argument("--analyze", action="store_true", help="execute the queries for real timings")
+    explain_parser.add_argument("--verbose", action="store_true", help="print each full plan")
+    args = parser.parse_args()
+
+    with psycopg.connect(CONNINFO, autocommit=True) as conn:
+        if args.command == "up":
+            up(conn)
+        elif args.command == "status":
+            status(conn)
+        elif explain(conn, args.min_rows, args.analyze, args.verbose):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
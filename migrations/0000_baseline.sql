@@ -0,0 +1,42 @@
+-- Core tables the services query. Existing databases already have them, so every
+-- statement is IF NOT EXISTS; column order matters because deps.row_to_user and
+-- authenticate read Users rows positionally.
+
+CREATE TABLE IF NOT EXISTS Users (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    full_name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    phone_number TEXT,
+    account_type TEXT NOT NULL,
+    subscribed BOOLEAN NOT NULL DEFAULT FALSE,
+    hashed_password TEXT
+);
+
+CREATE TABLE IF NOT EXISTS Buildings (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    description TEXT,
+    address TEXT,
+    bedroom_no TEXT,
+    bathroom_no TEXT,
+    furnished TEXT,
+    available_facilities TEXT,
+    interior_features TEXT,
+    exterior_features TEXT,
+    purpose TEXT,
+    price INTEGER,
+    payment_frequency INTEGER,
+    property_type TEXT
+);
+
+CREATE TABLE IF NOT EXISTS saved_buildings (
+    user_email TEXT NOT NULL,
+    building_id BIGINT NOT NULL REFERENCES Buildings (id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS OTPs (
+    email TEXT NOT NULL,
+    otp TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    is_used BOOLEAN NOT NULL DEFAULT FALSE
+);
@@ -0,0 +1,11 @@
+-- Composite indexes backing the filtered, keyset-paginated listing query in
+-- BuildingService.show_buildings (ORDER BY id DESC, WHERE id < cursor).
+
+CREATE INDEX IF NOT EXISTS buildings_type_purpose_furnished_id_idx
+    ON Buildings (property_type, purpose, furnished, id DESC);
+
+CREATE INDEX IF NOT EXISTS buildings_bedroom_bathroom_id_idx
+    ON Buildings (bedroom_no, bathroom_no, id DESC);
+
+CREATE INDEX IF NOT EXISTS buildings_price_id_idx
+    ON Buildings (price, id DESC);
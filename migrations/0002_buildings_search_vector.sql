@@ -0,0 +1,16 @@
+-- Full-text search over listings for BuildingService.search_buildings.
+-- The vector is a stored generated column, so Postgres keeps it current on
+-- every INSERT/UPDATE without any application code or triggers.
+
+ALTER TABLE Buildings ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(description, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(address, '')), 'A') ||
+        setweight(to_tsvector('english',
+            coalesce(available_facilities, '') || ' ' ||
+            coalesce(interior_features, '') || ' ' ||
+            coalesce(exterior_features, '')), 'B')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS buildings_search_vector_idx
+    ON Buildings USING GIN (search_vector);
@@ -0,0 +1,8 @@
+-- Access paths for services/otp_store.py: the newest unused code per email
+-- (verify_and_consume) and expired rows (the background sweeper).
+
+CREATE INDEX IF NOT EXISTS otps_email_is_used_created_at_idx
+    ON OTPs (email, is_used, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS otps_expires_at_idx
+    ON OTPs (expires_at);
@@ -0,0 +1,11 @@
+-- One row per (user, building) so save/unsave can be single idempotent
+-- INSERT ... ON CONFLICT / DELETE statements. Existing duplicates are removed first.
+
+DELETE FROM saved_buildings a
+    USING saved_buildings b
+    WHERE a.ctid < b.ctid
+      AND a.user_email = b.user_email
+      AND a.building_id = b.building_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS saved_buildings_user_building_key
+    ON saved_buildings (user_email, building_id);
@@ -0,0 +1,10 @@
+-- get_user looks accounts up by email on every authenticated request, and
+-- signup relies on email being unique. Fails if duplicate emails already
+-- exist; resolve those by hand first, since which account to keep is a business decision.
+
+CREATE UNIQUE INDEX IF NOT EXISTS users_email_key
+    ON Users (email);
+
+-- Reverse lookup for ON DELETE CASCADE from Buildings and per-building save counts.
+CREATE INDEX IF NOT EXISTS saved_buildings_building_id_idx
+    ON saved_buildings (building_id);
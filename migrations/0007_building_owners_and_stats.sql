@@ -0,0 +1,183 @@
+-- Listing ownership plus counters for the landlord dashboard (BuildingService.owner_dashboard).
+-- owner_stats and building_save_counts are kept current by statement-level triggers
+-- over transition tables, so a COPY batch of 1000 listings costs one aggregated
+-- upsert per owner rather than one per row, and the dashboard never runs GROUP BY.
+-- Listings posted before this migration have no owner and are not counted per owner.
+
+ALTER TABLE Buildings ADD COLUMN IF NOT EXISTS owner_email TEXT;
+
+CREATE INDEX IF NOT EXISTS buildings_owner_email_id_idx
+    ON Buildings (owner_email, id DESC);
+
+CREATE TABLE IF NOT EXISTS owner_stats (
+    owner_email TEXT PRIMARY KEY,
+    listings BIGINT NOT NULL DEFAULT 0,
+    priced_listings BIGINT NOT NULL DEFAULT 0,
+    price_sum NUMERIC NOT NULL DEFAULT 0,
+    saves BIGINT NOT NULL DEFAULT 0
+);
+
+-- owner_email is copied here so save/unsave and listing deletes can settle the
+-- owner's total in either trigger order without looking the building up again.
+CREATE TABLE IF NOT EXISTS building_save_counts (
+    building_id BIGINT PRIMARY KEY,
+    owner_email TEXT,
+    saves BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION buildings_after_insert() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO owner_stats AS s (owner_email, listings, priced_listings, price_sum)
+    SELECT owner_email, count(*), count(price), coalesce(sum(price), 0)
+    FROM new_rows
+    WHERE owner_email IS NOT NULL
+    GROUP BY owner_email
+    ON CONFLICT (owner_email) DO UPDATE SET
+        listings = s.listings + EXCLUDED.listings,
+        priced_listings = s.priced_listings + EXCLUDED.priced_listings,
+        price_sum = s.price_sum + EXCLUDED.price_sum;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION buildings_after_delete() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE owner_stats s SET
+        listings = s.listings - d.listings,
+        priced_listings = s.priced_listings - d.priced_listings,
+        price_sum = s.price_sum - d.price_sum
+    FROM (
+        SELECT owner_email, count(*) AS listings, count(price) AS priced_listings, coalesce(sum(price), 0) AS price_sum
+        FROM old_rows
+        WHERE owner_email IS NOT NULL
+        GROUP BY owner_email
+    ) d
+    WHERE s.owner_email = d.owner_email;
+
+    WITH gone AS (
+        DELETE FROM building_save_counts c
+        USING old_rows o
+        WHERE c.building_id = o.id
+        RETURNING c.owner_email, c.saves
+    )
+    UPDATE owner_stats s SET saves = s.saves - g.saves
+    FROM (SELECT owner_email, sum(saves) AS saves FROM gone WHERE owner_email IS NOT NULL GROUP BY owner_email) g
+    WHERE s.owner_email = g.owner_email;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION buildings_after_update() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO owner_stats AS s (owner_email, listings, priced_listings, price_sum)
+    SELECT owner_email, sum(sign), coalesce(sum(sign) FILTER (WHERE price IS NOT NULL), 0), coalesce(sum(sign * price), 0)
+    FROM (
+        -- Transition tables can't be combined with UPDATE OF column lists, so skip
+        -- rows whose owner and price didn't change (e.g. backfills of other columns).
+        SELECT n.owner_email, n.price, 1 AS sign
+        FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE (n.owner_email, n.price) IS DISTINCT FROM (o.owner_email, o.price)
+        UNION ALL
+        SELECT o.owner_email, o.price, -1
+        FROM new_rows n JOIN old_rows o ON o.id = n.id
+        WHERE (n.owner_email, n.price) IS DISTINCT FROM (o.owner_email, o.price)
+    ) delta
+    WHERE owner_email IS NOT NULL
+    GROUP BY owner_email
+    ON CONFLICT (owner_email) DO UPDATE SET
+        listings = s.listings + EXCLUDED.listings,
+        priced_listings = s.priced_listings + EXCLUDED.priced_listings,
+        price_sum = s.price_sum + EXCLUDED.price_sum;
+
+    -- A listing that changes hands takes its save count to the new owner.
+    WITH moved AS (
+        UPDATE building_save_counts c SET owner_email = n.owner_email
+        FROM new_rows n
+        JOIN old_rows o ON o.id = n.id
+        WHERE c.building_id = n.id AND o.owner_email IS DISTINCT FROM n.owner_email
+        RETURNING o.owner_email AS old_owner, n.owner_email AS new_owner, c.saves
+    )
+    INSERT INTO owner_stats AS s (owner_email, saves)
+    SELECT owner_email, sum(saves)
+    FROM (
+        SELECT new_owner AS owner_email, saves FROM moved
+        UNION ALL
+        SELECT old_owner, -saves FROM moved
+    ) delta
+    WHERE owner_email IS NOT NULL
+    GROUP BY owner_email
+    ON CONFLICT (owner_email) DO UPDATE SET saves = s.saves + EXCLUDED.saves;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION saved_buildings_after_insert() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    WITH delta AS (
+        SELECT n.building_id, b.owner_email, count(*) AS saves
+        FROM new_rows n
+        JOIN Buildings b ON b.id = n.building_id
+        GROUP BY n.building_id, b.owner_email
+    ), counted AS (
+        INSERT INTO building_save_counts AS c (building_id, owner_email, saves)
+        SELECT building_id, owner_email, saves FROM delta
+        ON CONFLICT (building_id) DO UPDATE SET saves = c.saves + EXCLUDED.saves
+    )
+    INSERT INTO owner_stats AS s (owner_email, saves)
+    SELECT owner_email, sum(saves) FROM delta
+    WHERE owner_email IS NOT NULL
+    GROUP BY owner_email
+    ON CONFLICT (owner_email) DO UPDATE SET saves = s.saves + EXCLUDED.saves;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION saved_buildings_after_delete() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- If the listing itself was deleted first, its counter row is already gone and nothing changes here.
+    WITH counted AS (
+        UPDATE building_save_counts c SET saves = c.saves - d.saves
+        FROM (SELECT building_id, count(*) AS saves FROM old_rows GROUP BY building_id) d
+        WHERE c.building_id = d.building_id
+        RETURNING c.owner_email, d.saves
+    )
+    UPDATE owner_stats s SET saves = s.saves - x.saves
+    FROM (SELECT owner_email, sum(saves) AS saves FROM counted WHERE owner_email IS NOT NULL GROUP BY owner_email) x
+    WHERE s.owner_email = x.owner_email;
+    RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS buildings_owner_stats_insert ON Buildings;
+CREATE TRIGGER buildings_owner_stats_insert AFTER INSERT ON Buildings
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION buildings_after_insert();
+
+DROP TRIGGER IF EXISTS buildings_owner_stats_delete ON Buildings;
+CREATE TRIGGER buildings_owner_stats_delete AFTER DELETE ON Buildings
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION buildings_after_delete();
+
+DROP TRIGGER IF EXISTS buildings_owner_stats_update ON Buildings;
+CREATE TRIGGER buildings_owner_stats_update AFTER UPDATE ON Buildings
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION buildings_after_update();
+
+DROP TRIGGER IF EXISTS saved_buildings_counts_insert ON saved_buildings;
+CREATE TRIGGER saved_buildings_counts_insert AFTER INSERT ON saved_buildings
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION saved_buildings_after_insert();
+
+DROP TRIGGER IF EXISTS saved_buildings_counts_delete ON saved_buildings;
+CREATE TRIGGER saved_buildings_counts_delete AFTER DELETE ON saved_buildings
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION saved_buildings_after_delete();
+
+-- Seed the counters from existing saves. CREATE TRIGGER above holds a lock that
+-- blocks writes to saved_buildings until this migration commits, so none are missed.
+INSERT INTO building_save_counts (building_id, owner_email, saves)
+SELECT sb.building_id, b.owner_email, count(*)
+FROM saved_buildings sb
+JOIN Buildings b ON b.id = sb.building_id
+GROUP BY sb.building_id, b.owner_email
+ON CONFLICT (building_id) DO NOTHING;
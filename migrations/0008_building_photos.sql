@@ -0,0 +1,12 @@
+-- Photos attached to listings (services/media.py). Files live in content-addressed
+-- storage under MEDIA_ROOT keyed by sha256, so one file can back many rows.
+
+CREATE TABLE IF NOT EXISTS building_photos (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    building_id BIGINT NOT NULL REFERENCES Buildings (id) ON DELETE CASCADE,
+    sha256 TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    size BIGINT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    UNIQUE (building_id, sha256)
+);
@@ -0,0 +1,16 @@
+-- Coordinates for BuildingService.nearby_buildings. The GiST index over the
+-- point expression answers "inside this box" with an index scan, so haversine
+-- distance is only computed for listings already near the search centre.
+-- Listings without coordinates are never returned by the nearby search.
+
+ALTER TABLE Buildings ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION;
+ALTER TABLE Buildings ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION;
+
+ALTER TABLE Buildings DROP CONSTRAINT IF EXISTS buildings_location_check;
+ALTER TABLE Buildings ADD CONSTRAINT buildings_location_check CHECK (
+    (latitude IS NULL AND longitude IS NULL)
+    OR (latitude BETWEEN -90 AND 90 AND longitude BETWEEN -180 AND 180)
+);
+
+CREATE INDEX IF NOT EXISTS buildings_location_idx
+    ON Buildings USING GIST (point(longitude, latitude));
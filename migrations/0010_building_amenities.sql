@@ -0,0 +1,58 @@
+-- Canonical amenity terms (services/amenities.py) matched from the free-text
+-- facility/feature columns. 0011 backfills existing rows and 0012 builds the
+-- GIN index afterwards, which is much faster than maintaining it row by row.
+
+ALTER TABLE Buildings ADD COLUMN IF NOT EXISTS amenities TEXT[] NOT NULL DEFAULT '{}';
+
+-- Exact listings per term. The planner's guess for a term outside its sampled
+-- most-common elements is a flat 0.5% of rows, so a rare term can send the
+-- ORDER BY id LIMIT listing down the whole primary key; BuildingService checks
+-- these counts and filters through the GIN index first when matches are few.
+CREATE TABLE IF NOT EXISTS amenity_counts (
+    term TEXT PRIMARY KEY,
+    listings BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION buildings_amenities_after_change() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- Statement-level, so a COPY batch or the 0011 backfill is one aggregated upsert.
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO amenity_counts AS c (term, listings)
+        SELECT term, count(*) FROM new_rows, unnest(amenities) term GROUP BY term
+        ON CONFLICT (term) DO UPDATE SET listings = c.listings + EXCLUDED.listings;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE amenity_counts c SET listings = c.listings - d.listings
+        FROM (SELECT term, count(*) AS listings FROM old_rows, unnest(amenities) term GROUP BY term) d
+        WHERE c.term = d.term;
+    ELSE
+        INSERT INTO amenity_counts AS c (term, listings)
+        SELECT term, sum(sign) FROM (
+            SELECT unnest(n.amenities) AS term, 1 AS sign
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE n.amenities IS DISTINCT FROM o.amenities
+            UNION ALL
+            SELECT unnest(o.amenities), -1
+            FROM new_rows n JOIN old_rows o ON o.id = n.id
+            WHERE n.amenities IS DISTINCT FROM o.amenities
+        ) delta
+        GROUP BY term
+        ON CONFLICT (term) DO UPDATE SET listings = c.listings + EXCLUDED.listings;
+    END IF;
+    RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS buildings_amenity_counts_insert ON Buildings;
+CREATE TRIGGER buildings_amenity_counts_insert AFTER INSERT ON Buildings
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION buildings_amenities_after_change();
+
+DROP TRIGGER IF EXISTS buildings_amenity_counts_delete ON Buildings;
+CREATE TRIGGER buildings_amenity_counts_delete AFTER DELETE ON Buildings
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION buildings_amenities_after_change();
+
+DROP TRIGGER IF EXISTS buildings_amenity_counts_update ON Buildings;
+CREATE TRIGGER buildings_amenity_counts_update AFTER UPDATE ON Buildings
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION buildings_amenities_after_change();
@@ -0,0 +1,30 @@
+"""Fill Buildings.amenities for listings created before 0010.
+
+Rows are read through a server-side cursor and matched in Python, because the
+vocabulary lives in services/amenities.py. Results are COPYed into a temp table
+a batch at a time and applied with one joined UPDATE.
+"""
+from services.amenities import extract_amenities
+
+BATCH_SIZE = 5000
+
+
+def upgrade(conn):
+    conn.execute("CREATE TEMP TABLE amenity_backfill (id BIGINT PRIMARY KEY, amenities TEXT[] NOT NULL) ON COMMIT DROP")
+    with conn.cursor(name="amenity_source") as source:
+        source.itersize = BATCH_SIZE
+        source.execute("SELECT id, available_facilities, interior_features, exterior_features FROM Buildings")
+        while rows := source.fetchmany(BATCH_SIZE):
+            # The connection can't FETCH while a COPY is open, so each batch gets its own COPY.
+            with conn.cursor().copy("COPY amenity_backfill (id, amenities) FROM STDIN") as copy:
+                for id, *texts in rows:
+                    amenities = extract_amenities(*texts)
+                    if amenities:
+                        copy.write_row((id, amenities))
+    conn.execute(
+        """
+        UPDATE Buildings b SET amenities = a.amenities
+        FROM amenity_backfill a
+        WHERE b.id = a.id AND b.amenities IS DISTINCT FROM a.amenities
+        """
+    )
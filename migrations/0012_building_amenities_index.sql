@@ -0,0 +1,10 @@
+-- Backs the amenities (@>, all of) and any_amenities (&&, any of) listing filters.
+-- Each term's posting list is a bitmap, so multi-term AND/OR filters are answered
+-- by intersecting or unioning them inside one bitmap index scan.
+
+CREATE INDEX IF NOT EXISTS buildings_amenities_idx
+    ON Buildings USING GIN (amenities);
+
+-- Element statistics for the freshly backfilled column, so the planner's
+-- estimates for common terms are right from the first request.
+ANALYZE Buildings (amenities);
@@ -0,0 +1,48 @@
+-- Saved searches and the notifications behind live match delivery (services/saved_searches.py).
+-- Every worker LISTENs on both channels: building_inserted carries the ids of newly
+-- committed listings, saved_searches_changed the email whose searches changed.
+
+CREATE TABLE IF NOT EXISTS saved_searches (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    user_email TEXT NOT NULL,
+    name TEXT NOT NULL,
+    min_price INTEGER,
+    max_price INTEGER,
+    bedroom_no TEXT,
+    property_type TEXT,
+    purpose TEXT,
+    location TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS saved_searches_user_email_idx
+    ON saved_searches (user_email, id);
+
+CREATE OR REPLACE FUNCTION buildings_notify_inserted() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- NOTIFY payloads are capped at 8000 bytes, so large COPY batches go out in chunks of ids.
+    PERFORM pg_notify('building_inserted', ids)
+    FROM (
+        SELECT string_agg(id::text, ',' ORDER BY id) AS ids
+        FROM (SELECT id, (row_number() OVER (ORDER BY id) - 1) / 500 AS chunk FROM new_rows) numbered
+        GROUP BY chunk
+    ) chunks;
+    RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS buildings_notify_insert ON Buildings;
+CREATE TRIGGER buildings_notify_insert AFTER INSERT ON Buildings
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION buildings_notify_inserted();
+
+CREATE OR REPLACE FUNCTION saved_searches_notify_changed() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    PERFORM pg_notify('saved_searches_changed', coalesce(NEW.user_email, OLD.user_email));
+    RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS saved_searches_notify_change ON saved_searches;
+CREATE TRIGGER saved_searches_notify_change AFTER INSERT OR UPDATE OR DELETE ON saved_searches
+    FOR EACH ROW EXECUTE FUNCTION saved_searches_notify_changed();
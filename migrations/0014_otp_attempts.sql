@@ -0,0 +1,4 @@
+-- Verification attempts per code, counted in the same statement that checks it
+-- (services/otp_store.py), so OTP_MAX_ATTEMPTS holds across workers and concurrent guesses.
+
+ALTER TABLE OTPs ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,27 @@
+"""Re-extract Buildings.amenities after ambiguous short synonyms became whole-entry only
+and negated mentions ("no gen") stopped counting.
+
+Same approach as 0011, except every row is written, so listings that lose all their
+amenities are cleared too. The 0010 trigger keeps amenity_counts in step.
+"""
+from services.amenities import extract_amenities
+
+BATCH_SIZE = 5000
+
+
+def upgrade(conn):
+    conn.execute("CREATE TEMP TABLE amenity_backfill (id BIGINT PRIMARY KEY, amenities TEXT[] NOT NULL) ON COMMIT DROP")
+    with conn.cursor(name="amenity_source") as source:
+        source.itersize = BATCH_SIZE
+        source.execute("SELECT id, available_facilities, interior_features, exterior_features FROM Buildings")
+        while rows := source.fetchmany(BATCH_SIZE):
+            with conn.cursor().copy("COPY amenity_backfill (id, amenities) FROM STDIN") as copy:
+                for id, *texts in rows:
+                    copy.write_row((id, extract_amenities(*texts)))
+    conn.execute(
+        """
+        UPDATE Buildings b SET amenities = a.amenities
+        FROM amenity_backfill a
+        WHERE b.id = a.id AND b.amenities IS DISTINCT FROM a.amenities
+        """
+    )
@@ -0,0 +1,68 @@
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from passlib.context import CryptContext
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Worker processes for bcrypt; 0 hashes on the request threadpool instead.
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 1)))
+# Hash/verify jobs allowed in flight per process before new ones are shed with a 429.
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", str(max(PASSWORD_WORKERS, 1) * 8)))
+
+# Changing BCRYPT_ROUNDS marks existing hashes as needing an update, which
+# verify_password picks up to rehash transparently on the next successful login.
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+_executor = None
+_in_flight = 0
+
+
+def _hash(password: str):
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str):
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        # spawn keeps workers free of the parent's sockets and event loop.
+        _executor = ProcessPoolExecutor(max_workers=PASSWORD_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _run(func, *args):
+    global _in_flight
+    if _in_flight >= PASSWORD_QUEUE_LIMIT:
+        raise HTTPException(status_code=429, detail="Too many requests, please retry shortly", headers={"Retry-After": "1"})
+    _in_flight += 1
+    try:
+        if PASSWORD_WORKERS == 0:
+            return await run_in_threadpool(func, *args)
+        return await asyncio.get_running_loop().run_in_executor(get_executor(), func, *args)
+    finally:
+        _in_flight -= 1
+
+
+async def hash_password(password: str):
+    return await _run(_hash, password)
+
+
+async def verify_password(password: str, hashed_password: str):
+    """Return (matches, new_hash); new_hash is set when the stored hash used an outdated cost."""
+    return await _run(_verify_and_update, password, hashed_password)
@@ -0,0 +1,104 @@
+import os
+import hashlib
+import orjson
+from cachetools import TTLCache
+from fastapi import Request, Response
+from pydantic import BaseModel
+from database import wrote_recently
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+# Upper bound on how stale another worker's cached page can be after a write elsewhere.
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+RESPONSE_MAX_AGE = int(os.getenv("RESPONSE_MAX_AGE", "30"))
+RESPONSE_STALE_WHILE_REVALIDATE = int(os.getenv("RESPONSE_STALE_WHILE_REVALIDATE", "60"))
+
+
+def encode_default(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def etag_matches(if_none_match: str | None, etag: str):
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """In-process cache of encoded JSON responses, keyed by path and query string.
+
+    Writes call invalidate(), which bumps the version so every cached body is
+    rebuilt on next use. That only reaches this worker, so a client that wrote
+    recently (possibly through another worker) bypasses the cache. Bodies carry a strong ETag (a hash of the bytes) so
+    clients and CDNs can revalidate with If-None-Match and get a 304.
+    """
+
+    def __init__(self, maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self):
+        self.version += 1
+        self.entries.clear()
+
+    @staticmethod
+    def key(request: Request):
+        return request.url.path, tuple(sorted(request.query_params.multi_items()))
+
+    @staticmethod
+    def encode(payload):
+        return orjson.dumps(payload, default=encode_default)
+
+    @staticmethod
+    def etag(body: bytes):
+        return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+    @staticmethod
+    def headers(etag: str, private=False):
+        if private:
+            cache_control = "private, no-cache"
+        else:
+            cache_control = f"public, max-age={RESPONSE_MAX_AGE}, stale-while-revalidate={RESPONSE_STALE_WHILE_REVALIDATE}"
+        return {"ETag": etag, "Cache-Control": cache_control, "Vary": "Authorization"}
+
+    async def respond(self, request: Request, build, personalize=None):
+        """Serve a cached body for this request, calling `await build()` to produce the payload on a miss.
+
+        When `personalize` is given, the shared payload is passed through
+        `await personalize(payload)` and the result is sent as a private response
+        that clients revalidate every time, so per-user fields are never shared.
+        """
+        key = self.key(request)
+        entry = self.entries.get(key)
+        if wrote_recently() or entry is None or entry[0] != self.version:
+            self.misses += 1
+            version = self.version
+            payload = await build()
+            body = self.encode(payload)
+            entry = (version, payload, body, self.etag(body))
+            # A write that landed while we were building makes this body stale; serve it but don't keep it.
+            if version == self.version:
+                self.entries[key] = entry
+        else:
+            self.hits += 1
+
+        _, payload, body, etag = entry
+        private = personalize is not None
+        if private:
+            personalized = await personalize(payload)
+            if personalized is not payload:
+                body = self.encode(personalized)
+                etag = self.etag(body)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=self.headers(etag, private))
+        return Response(content=body, media_type="application/json", headers=self.headers(etag, private))
+
+
+listing_cache = ResponseCache()
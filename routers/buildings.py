@@ -1,28 +1,129 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from typing import Annotated
-from schema.home_schema import BuildingCreate
+from schema.home_schema import BuildingCreate, BuildingDisplay, BuildingPhoto, BuildingFilters, BuildingPage, NearbyBuilding, OwnerDashboard, SaveBuildingsRequest
 from schema.user_schema import User
-from deps import get_current_user
+from deps import get_current_user, get_optional_user
 from services.buildings import building_crud
+from services.amenities import AMENITIES
+from response_cache import listing_cache
 
 buildingrouter = APIRouter()
 
 
 @buildingrouter.post("/post")
-def post_a_building(building_data:BuildingCreate, current_user: Annotated[User, Depends(get_current_user)]):
-    return building_crud.building_create(building_data, current_user)
+async def post_a_building(building_data:BuildingCreate, current_user: Annotated[User, Depends(get_current_user)]):
+    return await building_crud.building_create(building_data, current_user)
     
 
-@buildingrouter.get("/")
-def show_buildings():
-    return building_crud.show_buildings()
+@buildingrouter.post("/bulk")
+async def bulk_import_buildings(request: Request, current_user: Annotated[User, Depends(get_current_user)]):
+    return await building_crud.bulk_import(request.stream(), request.headers.get("content-type", ""), current_user)
+
+
+@buildingrouter.get("/", response_model=BuildingPage)
+async def show_buildings(request: Request, filters: Annotated[BuildingFilters, Depends()], current_user: Annotated[User | None, Depends(get_optional_user)], limit: int = Query(20, ge=1, le=100), cursor: str | None = None, ids: str | None = Query(None, description="Comma-separated building ids to fetch instead of paging")):
+    async def personalize(page):
+        return {**page, "items": await building_crud.mark_saved(page["items"], current_user)}
+
+    if ids is not None:
+        try:
+            id_list = [int(id) for id in ids.split(",") if id.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+        if not 1 <= len(id_list) <= 100:
+            raise HTTPException(status_code=400, detail="Provide between 1 and 100 ids")
+
+        async def build():
+            return {"items": await building_crud.get_buildings(id_list), "next_cursor": None}
+        return await listing_cache.respond(request, build, personalize if current_user else None)
+
+    return await listing_cache.respond(request, lambda: building_crud.show_buildings(filters, limit, cursor), personalize if current_user else None)
+
+
+@buildingrouter.get("/stream")
+async def stream_buildings(filters: Annotated[BuildingFilters, Depends()]):
+    return StreamingResponse(building_crud.stream_buildings(filters), media_type="application/x-ndjson")
+
+
+@buildingrouter.get("/amenities", response_model=list[str])
+async def list_amenities():
+    return sorted(AMENITIES)
+
+
+@buildingrouter.get("/search", response_model=list[BuildingDisplay])
+async def search_buildings(request: Request, current_user: Annotated[User | None, Depends(get_optional_user)], q: str = Query(..., min_length=1, max_length=200), limit: int = Query(20, ge=1, le=100)):
+    async def personalize(items):
+        return await building_crud.mark_saved(items, current_user)
+    return await listing_cache.respond(request, lambda: building_crud.search_buildings(q, limit), personalize if current_user else None)
+
+
+@buildingrouter.get("/nearby", response_model=list[NearbyBuilding])
+async def nearby_buildings(request: Request, filters: Annotated[BuildingFilters, Depends()], current_user: Annotated[User | None, Depends(get_optional_user)], lat: float = Query(..., ge=-90, le=90), lng: float = Query(..., ge=-180, le=180), radius_km: float = Query(5, gt=0, le=100), bbox: str | None = Query(None, description="Map viewport as min_lng,min_lat,max_lng,max_lat"), limit: int = Query(20, ge=1, le=100)):
+    box = None
+    if bbox is not None:
+        try:
+            box = tuple(float(value) for value in bbox.split(","))
+        except ValueError:
+            box = ()
+        if len(box) != 4 or box[0] > box[2] or box[1] > box[3]:
+            raise HTTPException(status_code=400, detail="bbox must be min_lng,min_lat,max_lng,max_lat")
+
+    async def personalize(items):
+        return await building_crud.mark_saved(items, current_user)
+    return await listing_cache.respond(request, lambda: building_crud.nearby_buildings(lat, lng, radius_km, filters, limit, box), personalize if current_user else None)
 
 
 @buildingrouter.post("/save/{id}")
-def save_a_building(id:str, current_user: Annotated[User, Depends(get_current_user)]):
-    return building_crud.save_a_building(id, current_user)
+async def save_a_building(id:int, current_user: Annotated[User, Depends(get_current_user)]):
+    return await building_crud.save_a_building(id, current_user)
+
+
+@buildingrouter.delete("/save/{id}")
+async def unsave_a_building(id:int, current_user: Annotated[User, Depends(get_current_user)]):
+    return await building_crud.unsave_a_building(id, current_user)
+
+
+@buildingrouter.post("/save")
+async def save_many_buildings(payload: SaveBuildingsRequest, current_user: Annotated[User, Depends(get_current_user)]):
+    return await building_crud.save_many_buildings(payload.ids, current_user)
+
+
+@buildingrouter.get("/saved", response_model=list[BuildingDisplay])
+async def show_saved(current_user: Annotated[User, Depends(get_current_user)]):
+    return ORJSONResponse(await building_crud.list_saved_buildings(current_user))
+
+
+@buildingrouter.get("/mine", response_model=BuildingPage)
+async def show_my_buildings(current_user: Annotated[User, Depends(get_current_user)], limit: int = Query(20, ge=1, le=100), cursor: str | None = None):
+    return ORJSONResponse(await building_crud.my_buildings(current_user, limit, cursor))
+
+
+@buildingrouter.get("/dashboard", response_model=OwnerDashboard)
+async def show_dashboard(current_user: Annotated[User, Depends(get_current_user)], limit: int = Query(50, ge=1, le=500)):
+    return await building_crud.owner_dashboard(current_user, limit)
+
+
+@buildingrouter.post("/{id:int}/photos", response_model=list[BuildingPhoto])
+async def upload_photos(request: Request, id: int, current_user: Annotated[User, Depends(get_current_user)]):
+    return await building_crud.add_photos(id, request.stream(), request.headers.get("content-type", ""), current_user)
+
+
+@buildingrouter.get("/{id:int}/photos", response_model=list[BuildingPhoto])
+async def show_photos(id: int):
+    return await building_crud.list_photos(id)
+
+
+@buildingrouter.get("/{id:int}/similar", response_model=list[BuildingDisplay])
+async def similar_buildings(request: Request, id: int, current_user: Annotated[User | None, Depends(get_optional_user)], k: int = Query(10, ge=1, le=50)):
+    async def personalize(items):
+        return await building_crud.mark_saved(items, current_user)
+    return await listing_cache.respond(request, lambda: building_crud.similar_buildings(id, k), personalize if current_user else None)
 
 
-@buildingrouter.get("/saved")
-def show_saved(current_user: Annotated[User, Depends(get_current_user)]):
-    return building_crud.list_saved_buildings(current_user)
\ No newline at end of file
+# Registered last so the static paths above take precedence over the id pattern.
+@buildingrouter.get("/{id:int}", response_model=BuildingDisplay)
+async def show_building(request: Request, id: int, current_user: Annotated[User | None, Depends(get_optional_user)]):
+    async def personalize(building):
+        return (await building_crud.mark_saved([building], current_user))[0]
+    return await listing_cache.respond(request, lambda: building_crud.get_building(id), personalize if current_user else None)
@@ -0,0 +1,47 @@
+import re
+import aiofiles.os
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from response_cache import etag_matches
+from services.media import THUMBNAIL_SIZES, original_path, thumbnail_queue, sniff
+
+mediarouter = APIRouter()
+
+DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+
+async def serve(request: Request, path: str, etag: str, media_type: str):
+    # Paths are content hashes, so a stored file never changes and can be cached for good.
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    # FileResponse answers Range and If-Range requests itself.
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+def check_digest(digest: str):
+    if not DIGEST.match(digest):
+        raise HTTPException(status_code=404, detail="Media not found")
+
+
+@mediarouter.get("/{digest}")
+async def get_media(request: Request, digest: str):
+    check_digest(digest)
+    path = original_path(digest)
+    try:
+        async with aiofiles.open(path, "rb") as f:
+            head = await f.read(16)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Media not found")
+    return await serve(request, path, f'"{digest}"', sniff(head) or "application/octet-stream")
+
+
+@mediarouter.get("/{digest}/thumb/{size}")
+async def get_thumbnail(request: Request, digest: str, size: int):
+    check_digest(digest)
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=404, detail="Media not found")
+    if not await aiofiles.os.path.exists(original_path(digest)):
+        raise HTTPException(status_code=404, detail="Media not found")
+    path = await thumbnail_queue.ensure(digest, size)
+    return await serve(request, path, f'"{digest}-{size}"', "image/jpeg")
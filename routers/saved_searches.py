@@ -0,0 +1,75 @@
+import os
+import asyncio
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from typing import Annotated
+from schema.home_schema import SavedSearch, SavedSearchCreate
+from schema.user_schema import User
+from deps import get_current_user
+from services.saved_searches import saved_search_crud, search_alerts
+
+# Idle streams get a comment line this often so proxies don't time them out.
+SSE_KEEPALIVE = float(os.getenv("SSE_KEEPALIVE", "15"))
+SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", "5000"))
+
+searchrouter = APIRouter()
+
+
+@searchrouter.post("/", response_model=SavedSearch)
+async def create_saved_search(search: SavedSearchCreate, current_user: Annotated[User, Depends(get_current_user)]):
+    return await saved_search_crud.create_search(search, current_user)
+
+
+@searchrouter.get("/", response_model=list[SavedSearch])
+async def list_saved_searches(current_user: Annotated[User, Depends(get_current_user)]):
+    return await saved_search_crud.list_searches(current_user)
+
+
+@searchrouter.delete("/{id:int}")
+async def delete_saved_search(id: int, current_user: Annotated[User, Depends(get_current_user)]):
+    return await saved_search_crud.delete_search(id, current_user)
+
+
+def sse_event(id: int, data: bytes):
+    return b"id: %d\nevent: match\ndata: %s\n\n" % (id, data)
+
+
+@searchrouter.get("/stream")
+async def stream_matches(request: Request, current_user: Annotated[User, Depends(get_current_user)]):
+    """Server-Sent Events: one `match` event per new listing that satisfies any of the user's saved searches.
+
+    Browsers' EventSource can't set an Authorization header, so web clients need a
+    fetch-based SSE reader. A reconnect with Last-Event-ID first replays matches
+    among the listings inserted since that id.
+    """
+    email = current_user.email
+    queue = await search_alerts.subscribe(email)
+    try:
+        last_id = int(request.headers.get("last-event-id", ""))
+    except ValueError:
+        last_id = None
+    try:
+        replayed = await search_alerts.replay(email, last_id) if last_id is not None else []
+    except BaseException:
+        search_alerts.unsubscribe(email, queue)
+        raise
+
+    async def events():
+        try:
+            yield b"retry: %d\n\n" % SSE_RETRY_MS
+            sent = set()
+            for id, data in replayed:
+                sent.add(id)
+                yield sse_event(id, data)
+            while True:
+                try:
+                    id, data = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if id not in sent:
+                    yield sse_event(id, data)
+        finally:
+            search_alerts.unsubscribe(email, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
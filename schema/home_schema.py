@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator, model_validator
 
 
 class BuildingCreate(BaseModel):
@@ -14,9 +14,85 @@ class BuildingCreate(BaseModel):
     price: int
     payment_frequency: int
     property_type: str
+    latitude: float | None = Field(None, ge=-90, le=90)
+    longitude: float | None = Field(None, ge=-180, le=180)
+
+    @field_validator("latitude", "longitude", mode="before")
+    @classmethod
+    def blank_as_none(cls, value):
+        # Bulk CSV imports send empty cells for listings without coordinates.
+        return None if isinstance(value, str) and not value.strip() else value
+
+    @model_validator(mode="after")
+    def both_coordinates(self):
+        if (self.latitude is None) != (self.longitude is None):
+            raise ValueError("latitude and longitude must be given together")
+        return self
 
 class Building(BuildingCreate):
     id: str
 
 class BuildingDisplay(BuildingCreate):
-    pass
\ No newline at end of file
+    id: int
+    amenities: list[str] = []
+    is_saved: bool | None = None
+
+class BuildingFilters(BaseModel):
+    min_price: int | None = Field(None, ge=0)
+    max_price: int | None = Field(None, ge=0)
+    bedroom_no: str | None = None
+    bathroom_no: str | None = None
+    purpose: str | None = None
+    property_type: str | None = None
+    furnished: str | None = None
+    amenities: str | None = Field(None, description="Comma-separated amenity terms a listing must all have")
+    any_amenities: str | None = Field(None, description="Comma-separated amenity terms a listing must have at least one of")
+
+class NearbyBuilding(BuildingDisplay):
+    distance_km: float
+
+class BuildingPage(BaseModel):
+    items: list[BuildingDisplay]
+    next_cursor: str | None = None
+
+class SaveBuildingsRequest(BaseModel):
+    ids: list[int] = Field(..., min_length=1, max_length=100)
+
+class ListingSaves(BaseModel):
+    id: int
+    description: str
+    price: int
+    saves: int
+
+class OwnerDashboard(BaseModel):
+    listings: int
+    total_saves: int
+    average_price: float | None = None
+    listing_saves: list[ListingSaves]
+
+class BuildingPhoto(BaseModel):
+    id: int
+    content_type: str
+    size: int
+    url: str
+    thumbnails: dict[str, str]
+
+class SavedSearchCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    min_price: int | None = Field(None, ge=0)
+    max_price: int | None = Field(None, ge=0)
+    bedroom_no: str | None = None
+    property_type: str | None = None
+    purpose: str | None = None
+    location: str | None = Field(None, max_length=200, description="Text the listing address must contain, case-insensitive")
+
+    @model_validator(mode="after")
+    def has_criteria(self):
+        if self.min_price is not None and self.max_price is not None and self.min_price > self.max_price:
+            raise ValueError("min_price must not exceed max_price")
+        if all(getattr(self, field) in (None, "") for field in ("min_price", "max_price", "bedroom_no", "property_type", "purpose", "location")):
+            raise ValueError("a saved search needs at least one criterion")
+        return self
+
+class SavedSearch(SavedSearchCreate):
+    id: int
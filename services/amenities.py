@@ -0,0 +1,125 @@
+import os
+import re
+import time
+from fastapi import HTTPException
+from database import get_connection
+
+AMENITY_STATS_TTL = float(os.getenv("AMENITY_STATS_TTL", "60"))
+# At or below this many expected matches, listings filter through the GIN index before ordering by id.
+AMENITY_SELECTIVE_ROWS = int(os.getenv("AMENITY_SELECTIVE_ROWS", "5000"))
+
+# Controlled vocabulary for listing amenities: canonical term -> phrases landlords write for it.
+# The free-text available_facilities/interior_features/exterior_features columns are kept as
+# entered; the matched canonical terms go in Buildings.amenities, a GIN-indexed text[].
+# New terms or synonyms only reach existing listings through a backfill migration like 0011 or 0015.
+AMENITIES = {
+    "borehole": ("borehole", "bore hole", "bore-hole"),
+    "water_treatment": ("water treatment", "water treatment plant", "water purifier"),
+    "generator": ("generator", "standby generator"),
+    "inverter": ("inverter",),
+    "solar": ("solar", "solar panel", "solar panels", "solar power"),
+    "prepaid_meter": ("prepaid meter", "pre-paid meter", "prepaid"),
+    "security": ("security", "security guard", "security post", "gateman", "24/7 security", "24 hour security"),
+    "cctv": ("cctv", "security camera", "security cameras"),
+    "gated": ("gated", "gated estate", "gated community", "estate gate"),
+    "fenced": ("fenced", "fence", "fenced compound", "perimeter fence"),
+    "parking": ("parking", "parking space", "parking lot", "car park", "garage"),
+    "swimming_pool": ("swimming pool",),
+    "gym": ("gym", "gymnasium", "fitness centre", "fitness center"),
+    "elevator": ("elevator", "lift"),
+    "internet": ("internet", "wifi", "wi-fi", "fibre", "fiber"),
+    "air_conditioning": ("air conditioning", "air conditioner", "air conditioners", "ac", "a/c"),
+    "water_heater": ("water heater",),
+    "pop_ceiling": ("pop ceiling", "p.o.p ceiling"),
+    "tiled_floors": ("tiled floors", "tiled floor", "floor tiles"),
+    "wardrobe": ("wardrobe", "wardrobes", "fitted wardrobe", "built-in wardrobe"),
+    "kitchen_cabinets": ("kitchen cabinets", "kitchen cabinet", "fitted kitchen"),
+    "ensuite": ("ensuite", "en-suite", "en suite", "all rooms ensuite"),
+    "balcony": ("balcony", "balconies"),
+    "boys_quarters": ("boys quarters", "boys quarter", "bq"),
+    "garden": ("garden", "lawn"),
+    "playground": ("playground", "play area"),
+}
+
+# Short words that only name an amenity when they make up a whole facility entry
+# ("Borehole, Pool, Gen"); inside free text they are too ambiguous ("pool table", "solar heater").
+ENTRY_ALIASES = {
+    "pool": "swimming_pool",
+    "gen": "generator",
+    "pop": "pop_ceiling",
+    "p.o.p": "pop_ceiling",
+    "heater": "water_heater",
+    "tiles": "tiled_floors",
+    "tiled": "tiled_floors",
+}
+
+SYNONYMS = {phrase: term for term, phrases in AMENITIES.items() for phrase in (term.replace("_", " "), *phrases)}
+# Longest phrases first so "swimming pool" wins over "pool" and "prepaid meter" over "meter".
+TERM_PATTERN = re.compile(
+    r"(?<![\w/-])(" + "|".join(re.escape(phrase) for phrase in sorted(SYNONYMS, key=len, reverse=True)) + r")(?![\w/-])"
+)
+ENTRY_SEPARATOR = re.compile(r"[,;\n|•]+")
+# A mention is dropped when its entry says "no", "not", "without" etc. right before it,
+# allowing one word in between ("no gen", "without any parking", "non-ensuite").
+NEGATED = re.compile(r"(?<![\w/-])(?:no|not|non|without|lacks?|lacking)(?:[\s-]+[\w/-]+)?[\s-]*$")
+
+
+def extract_amenities(*texts: str | None):
+    """Sorted canonical amenity terms mentioned in texts, leaving out negated mentions."""
+    found = set()
+    for text in texts:
+        if not text:
+            continue
+        for entry in ENTRY_SEPARATOR.split(text.lower()):
+            entry = " ".join(entry.strip(" .").split())
+            if entry in ENTRY_ALIASES:
+                found.add(ENTRY_ALIASES[entry])
+                continue
+            for match in TERM_PATTERN.finditer(entry):
+                if not NEGATED.search(entry, 0, match.start()):
+                    found.add(SYNONYMS[match.group(1)])
+    return sorted(found)
+
+
+def parse_amenity_terms(value: str, param: str):
+    """Canonical terms for a comma-separated query parameter; unknown terms are a 400."""
+    terms = []
+    for raw in value.split(","):
+        phrase = " ".join(raw.strip().lower().replace("_", " ").split())
+        if not phrase:
+            continue
+        term = SYNONYMS.get(phrase) or ENTRY_ALIASES.get(phrase)
+        if term is None:
+            raise HTTPException(status_code=400, detail=f"Unknown amenity '{raw.strip()}' in {param}; see /buildings/amenities")
+        terms.append(term)
+    return sorted(set(terms))
+
+
+class AmenityStats:
+    """Listings per term from amenity_counts (migrations/0010), reloaded at most every AMENITY_STATS_TTL seconds."""
+
+    def __init__(self):
+        self.counts: dict[str, int] = {}
+        self.loaded_at = None
+
+    async def refresh(self):
+        async with get_connection() as conn:
+            cursor = await conn.execute("SELECT term, listings FROM amenity_counts")
+            self.counts = dict(await cursor.fetchall())
+        self.loaded_at = time.monotonic()
+
+    async def selective(self, all_terms: list[str], any_terms: list[str]):
+        """Whether a filter matches few enough listings that scanning its matches beats walking ids in order."""
+        if not all_terms and not any_terms:
+            return False
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > AMENITY_STATS_TTL:
+            await self.refresh()
+        estimates = []
+        if all_terms:
+            estimates.append(min(self.counts.get(term, 0) for term in all_terms))
+        if any_terms:
+            estimates.append(sum(self.counts.get(term, 0) for term in any_terms))
+        return min(estimates) <= AMENITY_SELECTIVE_ROWS
+
+
+amenity_stats = AmenityStats()
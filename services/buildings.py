@@ -1,121 +1,578 @@
+import os
+import math
+import base64
+import json
+import orjson
+from cachetools import TTLCache
 from fastapi import HTTPException
+from pydantic import ValidationError
+from psycopg.rows import dict_row
 from schema.user_schema import User
-from schema.home_schema import BuildingCreate, BuildingDisplay
-from database import db_pool
+from schema.home_schema import BuildingCreate, BuildingFilters
+from database import get_connection, get_read_connection, mark_write, wrote_recently
+from response_cache import listing_cache
+from services.amenities import amenity_stats, extract_amenities, parse_amenity_terms
+from services.bulk_import import RecordError, iter_csv_records, iter_ndjson_records
+from services.media import THUMBNAIL_SIZES, receive_photos, thumbnail_queue
+from services.similar import similar_listings
+
+BUILDING_FIELDS = ("id", "description", "address", "bedroom_no", "bathroom_no", "furnished", "available_facilities", "interior_features", "exterior_features", "purpose", "price", "payment_frequency", "property_type", "latitude", "longitude", "amenities")
+BUILDING_COLUMNS = ", ".join(BUILDING_FIELDS)
+BUILDING_COLUMNS_B = ", ".join(f"b.{f}" for f in BUILDING_FIELDS)
+# Rows fetched per round-trip when streaming a full result set as NDJSON.
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+# NDJSON streams open at once per process before new ones are shed with a 429.
+STREAM_MAX_OPEN = int(os.getenv("STREAM_MAX_OPEN", "20"))
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "1000"))
+# Row errors listed in a bulk import report; further failures are only counted.
+BULK_MAX_REPORTED_ERRORS = int(os.getenv("BULK_MAX_REPORTED_ERRORS", "500"))
+INSERT_FIELDS = tuple(BuildingCreate.model_fields)
+BUILDING_CACHE_SIZE = int(os.getenv("BUILDING_CACHE_SIZE", "5000"))
+# Bounds how long an out-of-band edit to a cached row (see building_cache) goes unseen.
+BUILDING_CACHE_TTL = float(os.getenv("BUILDING_CACHE_TTL", "300"))
+
+EARTH_RADIUS_KM = 6371.0088
+# Great-circle distance from the search centre (lat, lat, lng placeholders); only
+# evaluated for rows the GiST index has already placed inside the search box.
+HAVERSINE_KM = f"""2 * {EARTH_RADIUS_KM} * asin(sqrt(
+    sin(radians(latitude - %s) / 2) ^ 2
+    + cos(radians(%s)) * cos(radians(latitude)) * sin(radians(longitude - %s) / 2) ^ 2
+))"""
+
+# Read-your-writes key for listing pages. Pages are shared through listing_cache, so after
+# any listing write every page read on this worker goes to the primary, not just the poster's.
+LISTING_WRITES = "listings"
+
+# NDJSON streams currently being read on this worker (see stream_buildings).
+open_streams = 0
+
+# Hot building records by id, LRU-evicted. The app never updates or deletes a Buildings row
+# (photos live in building_photos), so entries only go stale through out-of-band edits such as
+# data migrations, for at most BUILDING_CACHE_TTL. An update path added here must pop its ids.
+building_cache = TTLCache(maxsize=BUILDING_CACHE_SIZE, ttl=BUILDING_CACHE_TTL)
+
+# Read paths fetch rows as dicts shaped like BuildingDisplay and encode them with
+# orjson directly, skipping per-row pydantic construction and response validation.
 
 class BuildingService:
 
     @staticmethod
-    def building_create(building_data:BuildingCreate, current_user: User):
-        conn = db_pool.getconn()
-        conn.autocommit = True
-        cursor = conn.cursor()
+    def building_amenities(building: BuildingCreate):
+        return extract_amenities(building.available_facilities, building.interior_features, building.exterior_features)
+
+    @staticmethod
+    async def building_create(building_data:BuildingCreate, current_user: User):
         if current_user.account_type.value not in ["Landlord", "Agent"]:
             raise HTTPException(status_code=401, detail="Message: Only LandLords Can Post Houses")
+        amenities = BuildingService.building_amenities(building_data)
         try:
-            cursor.execute("INSERT INTO Buildings(description,address,bedroom_no,bathroom_no,furnished,available_facilities,interior_features,exterior_features,purpose,price,payment_frequency,property_type) VALUES(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",(building_data.description,building_data.address,building_data.bedroom_no,building_data.bathroom_no,building_data.furnished,building_data.available_facilities,building_data.interior_features,building_data.exterior_features,building_data.purpose,building_data.price,building_data.payment_frequency,building_data.property_type))
-            conn.commit()
-            cursor.close()
-            db_pool.putconn(conn)
+            async with get_connection() as conn:
+                cursor = await conn.execute("INSERT INTO Buildings(description,address,bedroom_no,bathroom_no,furnished,available_facilities,interior_features,exterior_features,purpose,price,payment_frequency,property_type,latitude,longitude,amenities,owner_email) VALUES(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id",(building_data.description,building_data.address,building_data.bedroom_no,building_data.bathroom_no,building_data.furnished,building_data.available_facilities,building_data.interior_features,building_data.exterior_features,building_data.purpose,building_data.price,building_data.payment_frequency,building_data.property_type,building_data.latitude,building_data.longitude,amenities,current_user.email))
+                (id,) = await cursor.fetchone()
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=400, detail="Unable to add building to DB"+ str(e))
+        mark_write(LISTING_WRITES)
+        listing_cache.invalidate()
+        similar_listings.upsert([{**building_data.model_dump(), "id": id, "amenities": amenities}])
 
         return f"Building with Description: {building_data.description} had been created"
 
     @staticmethod
-    def show_buildings():
-        conn = db_pool.getconn()
-        conn.autocommit = True
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM Buildings")
-        buildings = cursor.fetchall()
+    async def copy_buildings(rows: list[tuple], owner_email: str):
+        """COPY rows of INSERT_FIELDS values, each followed by its amenities."""
+        async with get_connection() as conn:
+            async with conn.transaction():
+                async with conn.cursor() as cursor:
+                    async with cursor.copy(f"COPY Buildings ({', '.join(INSERT_FIELDS)}, amenities, owner_email) FROM STDIN") as copy:
+                        for row in rows:
+                            await copy.write_row((*row, owner_email))
 
-        if not buildings:
+    @staticmethod
+    async def bulk_import(chunks, content_type: str, current_user: User):
+        """Validate an uploaded CSV/NDJSON stream row by row and COPY valid rows in batches."""
+        if current_user.account_type.value not in ["Landlord", "Agent"]:
+            raise HTTPException(status_code=401, detail="Message: Only LandLords Can Post Houses")
+
+        media_type = content_type.split(";")[0].strip().lower()
+        if media_type == "text/csv":
+            records = iter_csv_records(chunks)
+        elif media_type in ("application/x-ndjson", "application/jsonl", "application/json-seq"):
+            records = iter_ndjson_records(chunks)
+        else:
+            raise HTTPException(status_code=415, detail="Upload must be text/csv or application/x-ndjson")
+
+        report = {"inserted": 0, "failed": 0, "errors": []}
+
+        def fail(line_no, errors):
+            report["failed"] += 1
+            if len(report["errors"]) < BULK_MAX_REPORTED_ERRORS:
+                report["errors"].append({"row": line_no, "errors": errors})
+
+        async def flush(batch):
+            try:
+                await BuildingService.copy_buildings([row for _, row in batch], current_user.email)
+                report["inserted"] += len(batch)
+            except HTTPException:
+                raise
+            except Exception as e:
+                # COPY is all-or-nothing per batch; report every row in it.
+                for line_no, _ in batch:
+                    fail(line_no, [f"Batch rejected by database: {e}"])
+
+        batch = []
+        async for line_no, record in records:
+            if isinstance(record, RecordError):
+                fail(line_no, [str(record)])
+                continue
+            try:
+                building = BuildingCreate.model_validate(record)
+            except ValidationError as e:
+                # Model-level validators report an empty loc; their message stands alone.
+                fail(line_no, [f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" if error["loc"] else error["msg"] for error in e.errors()])
+                continue
+            batch.append((line_no, (*(getattr(building, field) for field in INSERT_FIELDS), BuildingService.building_amenities(building))))
+            if len(batch) >= BULK_BATCH_SIZE:
+                await flush(batch)
+                batch = []
+        if batch:
+            await flush(batch)
+
+        if report["inserted"]:
+            mark_write(LISTING_WRITES)
+            listing_cache.invalidate()
+            if similar_listings.ready:
+                await similar_listings.catch_up()
+        return report
+
+    @staticmethod
+    def encode_cursor(last_id: int):
+        return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str):
+        try:
+            return int(json.loads(base64.urlsafe_b64decode(cursor.encode()))["id"])
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    @staticmethod
+    def listing_filters(filters: BuildingFilters):
+        clauses = []
+        params = []
+        if filters.min_price is not None:
+            clauses.append("price >= %s")
+            params.append(filters.min_price)
+        if filters.max_price is not None:
+            clauses.append("price <= %s")
+            params.append(filters.max_price)
+        for column in ("bedroom_no", "bathroom_no", "purpose", "property_type", "furnished"):
+            value = getattr(filters, column)
+            if value is not None:
+                clauses.append(f"{column} = %s")
+                params.append(value)
+        # Both operators are answered from the GIN index on amenities (migrations/0012).
+        if filters.amenities:
+            clauses.append("amenities @> %s::text[]")
+            params.append(parse_amenity_terms(filters.amenities, "amenities"))
+        if filters.any_amenities:
+            clauses.append("amenities && %s::text[]")
+            params.append(parse_amenity_terms(filters.any_amenities, "any_amenities"))
+        return clauses, params
+
+    @staticmethod
+    async def show_buildings(filters: BuildingFilters, limit: int, page_cursor: str | None = None):
+        clauses, params = BuildingService.listing_filters(filters)
+        if page_cursor:
+            clauses.append("id < %s")
+            params.append(BuildingService.decode_cursor(page_cursor))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        query = f"SELECT {BUILDING_COLUMNS} FROM Buildings {where} ORDER BY id DESC LIMIT %s"
+        selective = await amenity_stats.selective(
+            parse_amenity_terms(filters.amenities or "", "amenities"),
+            parse_amenity_terms(filters.any_amenities or "", "any_amenities")
+        )
+        if selective:
+            # Left to itself the planner may walk the id index and discard nearly every row.
+            query = f"WITH matches AS MATERIALIZED (SELECT {BUILDING_COLUMNS} FROM Buildings {where}) SELECT * FROM matches ORDER BY id DESC LIMIT %s"
+
+        async with get_read_connection(LISTING_WRITES) as conn:
+            # Fetch one extra row to learn whether another page exists without a COUNT.
+            cursor = conn.cursor(row_factory=dict_row)
+            await cursor.execute(query, (*params, limit + 1))
+            buildings = await cursor.fetchall()
+
+        if not buildings and not page_cursor:
             raise HTTPException(status_code=404, detail="No building found in DB")
 
-        building_list = []
-        for b in buildings:
-            building_list.append(BuildingDisplay(
-                description = b[1],
-                address = b[2],
-                bedroom_no = b[3],
-                bathroom_no = b[4],
-                furnished = b[5],
-                available_facilities = b[6],
-                interior_features = b[7],
-                exterior_features = b[8],
-                purpose = b[9],
-                price = b[10],
-                payment_frequency = b[11],
-                property_type = b[12]
-            ))
-        cursor.close()
-        db_pool.putconn(conn)
-        return building_list
-
-    @staticmethod
-    def save_a_building(id:str, current_user: User):
-        conn = db_pool.getconn()
-        conn.autocommit = True
-        cursor = conn.cursor()
-        if current_user.account_type.value != "User":
-            raise HTTPException(status_code=401, detail="Message: Only Users can Save Buildings")
+        next_cursor = None
+        if len(buildings) > limit:
+            buildings = buildings[:limit]
+            next_cursor = BuildingService.encode_cursor(buildings[-1]["id"])
+
+        return {"items": buildings, "next_cursor": next_cursor}
+
+    @staticmethod
+    def search_box(lat: float, lng: float, radius_km: float):
+        """(min_lng, min_lat, max_lng, max_lat) enclosing the circle of radius_km around (lat, lng)."""
+        angle = radius_km / EARTH_RADIUS_KM
+        min_lat = max(lat - math.degrees(angle), -90.0)
+        max_lat = min(lat + math.degrees(angle), 90.0)
+        ratio = math.sin(angle) / math.cos(math.radians(lat)) if abs(lat) < 90.0 else 2.0
+        if ratio >= 1.0:
+            # The circle contains a pole, so it spans every longitude.
+            return -180.0, min_lat, 180.0, max_lat
+        dlng = math.degrees(math.asin(ratio))
+        if lng - dlng < -180.0 or lng + dlng > 180.0:
+            # Circles over the antimeridian search the full band of latitude instead of two boxes.
+            return -180.0, min_lat, 180.0, max_lat
+        return lng - dlng, min_lat, lng + dlng, max_lat
+
+    @staticmethod
+    def clip_box(box, bbox):
+        if bbox is None:
+            return box
+        clipped = (max(box[0], bbox[0]), max(box[1], bbox[1]), min(box[2], bbox[2]), min(box[3], bbox[3]))
+        return clipped if clipped[0] <= clipped[2] and clipped[1] <= clipped[3] else None
 
-        cursor.execute("SELECT * FROM buildings WHERE id = %s",(id,))
-        found_building = cursor.fetchone()
+    @staticmethod
+    async def nearby_buildings(lat: float, lng: float, radius_km: float, filters: BuildingFilters, limit: int, bbox: tuple[float, float, float, float] | None = None):
+        """Listings within radius_km of (lat, lng), nearest first, optionally clipped to a map viewport.
+
+        In a dense area the radius box can hold tens of thousands of listings, so a
+        KNN scan of the GiST index first reads the `limit` nearest by flat lng/lat
+        distance. The farthest of those bounds the true distance of the
+        limit-th nearest listing, and the exact haversine pass then only visits
+        the (usually tiny) box around that smaller circle.
+        """
+        box = BuildingService.clip_box(BuildingService.search_box(lat, lng, radius_km), bbox)
+        if box is None:
+            return []
+        clauses, params = BuildingService.listing_filters(filters)
+        where = "".join(f" AND {clause}" for clause in clauses)
+
+        async with get_connection() as conn:
+            cursor = await conn.execute(
+                f"""
+                SELECT max(distance_km), count(*) FROM (
+                    SELECT {HAVERSINE_KM} AS distance_km
+                    FROM Buildings
+                    WHERE point(longitude, latitude) <@ box(point(%s, %s), point(%s, %s)){where}
+                    ORDER BY point(longitude, latitude) <-> point(%s, %s)
+                    LIMIT %s
+                ) knn
+                """,
+                (lat, lat, lng, *box, *params, lng, lat, limit)
+            )
+            farthest, found = await cursor.fetchone()
+            if not found:
+                return []
+            if found == limit and farthest < radius_km:
+                # A millimetre of slack so float rounding in the box can't drop the boundary listing.
+                radius_km = farthest + 1e-6
+                box = BuildingService.clip_box(BuildingService.search_box(lat, lng, radius_km), bbox)
+
+            cursor = conn.cursor(row_factory=dict_row)
+            await cursor.execute(
+                f"""
+                SELECT * FROM (
+                    SELECT {BUILDING_COLUMNS}, {HAVERSINE_KM} AS distance_km
+                    FROM Buildings
+                    WHERE point(longitude, latitude) <@ box(point(%s, %s), point(%s, %s)){where}
+                ) nearby
+                WHERE distance_km <= %s
+                ORDER BY distance_km, id DESC
+                LIMIT %s
+                """,
+                (lat, lat, lng, *box, *params, radius_km, limit)
+            )
+            buildings = await cursor.fetchall()
+        for building in buildings:
+            building["distance_km"] = round(building["distance_km"], 3)
+        return buildings
+
+    @staticmethod
+    async def my_buildings(current_user: User, limit: int, page_cursor: str | None = None):
+        if current_user.account_type.value not in ["Landlord", "Agent"]:
+            raise HTTPException(status_code=401, detail="Message: Only LandLords and Agents have listings")
+
+        clauses = ["owner_email = %s"]
+        params = [current_user.email]
+        if page_cursor:
+            clauses.append("id < %s")
+            params.append(BuildingService.decode_cursor(page_cursor))
+
+        async with get_connection() as conn:
+            # Served by buildings_owner_email_id_idx (migrations/0007).
+            cursor = conn.cursor(row_factory=dict_row)
+            await cursor.execute(f"SELECT {BUILDING_COLUMNS} FROM Buildings WHERE {' AND '.join(clauses)} ORDER BY id DESC LIMIT %s", (*params, limit + 1))
+            buildings = await cursor.fetchall()
 
-        if found_building is None:
+        next_cursor = None
+        if len(buildings) > limit:
+            buildings = buildings[:limit]
+            next_cursor = BuildingService.encode_cursor(buildings[-1]["id"])
+        return {"items": buildings, "next_cursor": next_cursor}
+
+    @staticmethod
+    async def owner_dashboard(current_user: User, limit: int):
+        """Totals from the trigger-maintained owner_stats row plus save counts for the newest listings."""
+        if current_user.account_type.value not in ["Landlord", "Agent"]:
+            raise HTTPException(status_code=401, detail="Message: Only LandLords and Agents have listings")
+
+        async with get_connection() as conn:
+            cursor = conn.cursor(row_factory=dict_row)
+            await cursor.execute(
+                """
+                SELECT listings, saves AS total_saves, round(price_sum / NULLIF(priced_listings, 0), 2)::float8 AS average_price
+                FROM owner_stats
+                WHERE owner_email = %s
+                """,
+                (current_user.email,)
+            )
+            stats = await cursor.fetchone() or {"listings": 0, "total_saves": 0, "average_price": None}
+            await cursor.execute(
+                """
+                SELECT b.id, b.description, b.price, coalesce(c.saves, 0) AS saves
+                FROM Buildings b
+                LEFT JOIN building_save_counts c ON c.building_id = b.id
+                WHERE b.owner_email = %s
+                ORDER BY b.id DESC
+                LIMIT %s
+                """,
+                (current_user.email, limit)
+            )
+            listing_saves = await cursor.fetchall()
+
+        return {**stats, "listing_saves": listing_saves}
+
+    @staticmethod
+    def photo_urls(photo: dict):
+        digest = photo.pop("sha256")
+        return {
+            **photo,
+            "url": f"/media/{digest}",
+            "thumbnails": {str(size): f"/media/{digest}/thumb/{size}" for size in THUMBNAIL_SIZES}
+        }
+
+    @staticmethod
+    async def add_photos(id: int, chunks, content_type: str, current_user: User):
+        """Stream uploaded photos to storage, attach them to the listing and queue their thumbnails."""
+        async with get_connection() as conn:
+            cursor = await conn.execute("SELECT owner_email FROM Buildings WHERE id = %s", (id,))
+            building = await cursor.fetchone()
+        if building is None:
+            raise HTTPException(status_code=404, detail="Message: Building With that ID not found")
+        if building[0] != current_user.email:
+            raise HTTPException(status_code=401, detail="Message: Only the listing's owner can add photos")
+
+        # No connection is held while the body streams in.
+        stored = await receive_photos(chunks, content_type)
+        for photo in stored:
+            thumbnail_queue.render(photo["sha256"])
+
+        async with get_connection() as conn:
+            cursor = conn.cursor()
+            await cursor.executemany(
+                """
+                INSERT INTO building_photos (building_id, sha256, content_type, size)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (building_id, sha256) DO NOTHING
+                """,
+                [(id, photo["sha256"], photo["content_type"], photo["size"]) for photo in stored]
+            )
+        return await BuildingService.list_photos(id)
+
+    @staticmethod
+    async def list_photos(id: int):
+        async with get_connection() as conn:
+            cursor = conn.cursor(row_factory=dict_row)
+            await cursor.execute(
+                "SELECT id, sha256, content_type, size FROM building_photos WHERE building_id = %s ORDER BY id",
+                (id,)
+            )
+            photos = await cursor.fetchall()
+        return [BuildingService.photo_urls(photo) for photo in photos]
+
+    @staticmethod
+    async def get_buildings(ids: list[int]):
+        """Fetch buildings by id in request order, serving hot records from building_cache
+        unless the client wrote recently, possibly through another worker."""
+        ids = list(dict.fromkeys(ids))
+        missing = ids if wrote_recently() else [id for id in ids if id not in building_cache]
+        if missing:
+            async with get_connection() as conn:
+                cursor = conn.cursor(row_factory=dict_row)
+                await cursor.execute(f"SELECT {BUILDING_COLUMNS} FROM Buildings WHERE id = ANY(%s)", (missing,))
+                for building in await cursor.fetchall():
+                    building_cache[building["id"]] = building
+        return [building_cache[id] for id in ids if id in building_cache]
+
+    @staticmethod
+    async def get_building(id: int):
+        buildings = await BuildingService.get_buildings([id])
+        if not buildings:
             raise HTTPException(status_code=404, detail="Message: Building With that ID not found")
+        return buildings[0]
+
+    @staticmethod
+    async def similar_buildings(id: int, k: int):
+        if not similar_listings.ready:
+            raise HTTPException(status_code=503, detail="Similar listings are still loading, please retry")
+        if id not in similar_listings:
+            # Inserted by another worker since this one's last catch-up.
+            similar_listings.upsert([await BuildingService.get_building(id)])
+        return await BuildingService.get_buildings(similar_listings.top_k(id, k))
 
-        cursor.execute("SELECT * FROM saved_buildings WHERE building_id = %s AND user_email = %s",(id,current_user.email))
-        saved_building = cursor.fetchone()
+    @staticmethod
+    def stream_buildings(filters: BuildingFilters):
+        """Every matching building as NDJSON batches, or a 429 once STREAM_MAX_OPEN streams are open."""
+        if open_streams >= STREAM_MAX_OPEN:
+            raise HTTPException(status_code=429, detail="Too many open streams, please retry shortly", headers={"Retry-After": "5"})
+        return BuildingService.stream_batches(filters)
 
-        if saved_building:
-            raise HTTPException(status_code=400, detail="Building Already Saved")
+    @staticmethod
+    async def stream_batches(filters: BuildingFilters):
+        """Yield matching buildings newest first, STREAM_BATCH_SIZE at a time.
 
+        Each batch is a keyset query (id below the last one sent) on a connection
+        returned to the pool before the batch is yielded, so a slow reader holds
+        neither a connection nor a transaction between batches.
+        """
+        global open_streams
+        open_streams += 1
         try:
-            cursor.execute("INSERT INTO saved_buildings(user_email,building_id) VALUES(%s, %s)",(current_user.email,id))
-            conn.commit()
-            cursor.close()
-            db_pool.putconn(conn)
+            clauses, params = BuildingService.listing_filters(filters)
+            last_id = None
+            while True:
+                batch_clauses = clauses if last_id is None else [*clauses, "id < %s"]
+                batch_params = params if last_id is None else [*params, last_id]
+                where = f"WHERE {' AND '.join(batch_clauses)}" if batch_clauses else ""
+                async with get_read_connection(LISTING_WRITES) as conn:
+                    cursor = conn.cursor(row_factory=dict_row)
+                    await cursor.execute(f"SELECT {BUILDING_COLUMNS} FROM Buildings {where} ORDER BY id DESC LIMIT %s", (*batch_params, STREAM_BATCH_SIZE))
+                    rows = await cursor.fetchall()
+                if rows:
+                    yield b"".join(orjson.dumps(row) + b"\n" for row in rows)
+                if len(rows) < STREAM_BATCH_SIZE:
+                    break
+                last_id = rows[-1]["id"]
+        finally:
+            open_streams -= 1
+
+    @staticmethod
+    async def search_buildings(q: str, limit: int):
+        async with get_connection() as conn:
+            # search_vector is a stored generated column with a GIN index (migrations/0002),
+            # so new rows from building_create are searchable as soon as they are inserted.
+            cursor = conn.cursor(row_factory=dict_row)
+            await cursor.execute(
+                f"""
+                SELECT {BUILDING_COLUMNS}
+                FROM Buildings, websearch_to_tsquery('english', %s) query
+                WHERE search_vector @@ query
+                ORDER BY ts_rank_cd(search_vector, query) DESC, id DESC
+                LIMIT %s
+                """,
+                (q, limit)
+            )
+            return await cursor.fetchall()
+
+    @staticmethod
+    async def save_a_building(id:int, current_user: User):
+        if current_user.account_type.value != "User":
+            raise HTTPException(status_code=401, detail="Message: Only Users can Save Buildings")
+
+        try:
+            async with get_connection() as conn:
+                # Existence check and insert in one statement; saving twice is a no-op.
+                cursor = await conn.execute(
+                    """
+                    WITH target AS (SELECT id FROM Buildings WHERE id = %s),
+                    saved AS (
+                        INSERT INTO saved_buildings (user_email, building_id)
+                        SELECT %s, id FROM target
+                        ON CONFLICT (user_email, building_id) DO NOTHING
+                    )
+                    SELECT EXISTS (SELECT 1 FROM target)
+                    """,
+                    (id, current_user.email)
+                )
+                (found_building,) = await cursor.fetchone()
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=400,detail="Unable to add to DB: "+ str(e))
 
+        if not found_building:
+            raise HTTPException(status_code=404, detail="Message: Building With that ID not found")
+        mark_write(current_user.email)
+
         return "Building Successfully saved"
 
     @staticmethod
-    def list_saved_buildings(current_user: User):
-        conn = db_pool.getconn()
-        conn.autocommit = True
-        cursor = conn.cursor()
+    async def save_many_buildings(ids: list[int], current_user: User):
         if current_user.account_type.value != "User":
-            raise HTTPException(status_code=401, detail="Message: Only Users can View Saved Buildings")
+            raise HTTPException(status_code=401, detail="Message: Only Users can Save Buildings")
+
+        async with get_connection() as conn:
+            cursor = await conn.execute(
+                """
+                WITH found AS (SELECT id FROM Buildings WHERE id = ANY(%s)),
+                saved AS (
+                    INSERT INTO saved_buildings (user_email, building_id)
+                    SELECT %s, id FROM found
+                    ON CONFLICT (user_email, building_id) DO NOTHING
+                )
+                SELECT id FROM found
+                """,
+                (ids, current_user.email)
+            )
+            found = {row[0] for row in await cursor.fetchall()}
+        mark_write(current_user.email)
 
-        cursor.execute("SELECT b.* FROM Buildings b JOIN saved_buildings sb ON b.id = sb.building_id WHERE sb.user_email = %s", (current_user.email,))
+        return {"saved": sorted(found), "not_found": sorted(set(ids) - found)}
+
+    @staticmethod
+    async def unsave_a_building(id:int, current_user: User):
+        if current_user.account_type.value != "User":
+            raise HTTPException(status_code=401, detail="Message: Only Users can Save Buildings")
+
+        async with get_connection() as conn:
+            await conn.execute("DELETE FROM saved_buildings WHERE user_email = %s AND building_id = %s", (current_user.email, id))
+        mark_write(current_user.email)
+
+        return "Building Successfully unsaved"
+
+    @staticmethod
+    async def mark_saved(items: list[dict], current_user: User | None):
+        """Copy listing items with an is_saved flag, resolved for the whole page in one query."""
+        if current_user is None or current_user.account_type.value != "User" or not items:
+            return items
+
+        async with get_connection() as conn:
+            cursor = await conn.execute(
+                "SELECT building_id FROM saved_buildings WHERE user_email = %s AND building_id = ANY(%s)",
+                (current_user.email, [item["id"] for item in items])
+            )
+            saved_ids = {row[0] for row in await cursor.fetchall()}
+
+        return [{**item, "is_saved": item["id"] in saved_ids} for item in items]
+
+    @staticmethod
+    async def list_saved_buildings(current_user: User):
+        if current_user.account_type.value != "User":
+            raise HTTPException(status_code=401, detail="Message: Only Users can View Saved Buildings")
 
-        saved_buildings = cursor.fetchall()
+        async with get_read_connection(current_user.email) as conn:
+            cursor = conn.cursor(row_factory=dict_row)
+            await cursor.execute(f"SELECT {BUILDING_COLUMNS_B} FROM Buildings b JOIN saved_buildings sb ON b.id = sb.building_id WHERE sb.user_email = %s", (current_user.email,))
+            saved_buildings = await cursor.fetchall()
 
         if not  saved_buildings:
             raise HTTPException(status_code=400,detail="No saved buildings")
 
-        saved_list = []
-        for building in saved_buildings:
-            saved_list.append(BuildingDisplay(
-                description = building[1],
-                address = building[2],
-                bedroom_no = building[3],
-                bathroom_no = building[4],
-                furnished = building[5],
-                available_facilities = building[6],
-                interior_features = building[7],
-                exterior_features = building[8],
-                purpose = building[9],
-                price = building[10],
-                payment_frequency = building[11],
-                property_type = building[12]
-            ))
-        cursor.close()
-        db_pool.putconn(conn)
-        return saved_list
+        return saved_buildings
     
 building_crud = BuildingService()
\ No newline at end of file
@@ -0,0 +1,184 @@
+import os
+import csv
+import codecs
+import orjson
+from collections import deque
+from typing import AsyncIterator
+
+# Longest line, and longest multi-line CSV record, accepted in characters. Longer ones are
+# reported as row errors and skipped, so one bad row can't make the import buffer the file.
+BULK_MAX_RECORD_CHARS = int(os.getenv("BULK_MAX_RECORD_CHARS", "65536"))
+
+
+class RecordError(Exception):
+    pass
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]):
+    """Yield decoded lines (without line endings) from a byte stream, one network chunk at a time.
+
+    A line longer than BULK_MAX_RECORD_CHARS is yielded as a RecordError instead, and
+    its remainder is discarded as it arrives rather than buffered.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    too_long = RecordError(f"Line longer than {BULK_MAX_RECORD_CHARS} characters")
+    pending = ""
+    skipping = False
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            if skipping:
+                # The end of an over-long line, already reported.
+                skipping = False
+                continue
+            yield too_long if len(line) > BULK_MAX_RECORD_CHARS else line.removesuffix("\r")
+        if len(pending) > BULK_MAX_RECORD_CHARS:
+            if not skipping:
+                yield too_long
+                skipping = True
+            pending = ""
+    pending += decoder.decode(b"", final=True)
+    if pending and not skipping:
+        yield too_long if len(pending) > BULK_MAX_RECORD_CHARS else pending.removesuffix("\r")
+
+
+async def iter_ndjson_records(chunks: AsyncIterator[bytes]):
+    """Yield (line number, dict or RecordError) for each non-blank NDJSON line."""
+    line_no = 0
+    async for line in iter_lines(chunks):
+        line_no += 1
+        if isinstance(line, RecordError):
+            yield line_no, line
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = orjson.loads(line)
+        except orjson.JSONDecodeError as e:
+            yield line_no, RecordError(f"Invalid JSON: {e}")
+            continue
+        if not isinstance(record, dict):
+            yield line_no, RecordError("Each line must be a JSON object")
+            continue
+        yield line_no, record
+
+
+def ends_quoted(line: str, quoted: bool):
+    """Whether a record is still inside a quoted field after line, by csv's default rules:
+    a quote opens a field only at its start, and "" inside one is an escaped quote.
+    Quotes elsewhere (5" TV) are literal."""
+    i, n = 0, len(line)
+    while i < n:
+        if quoted:
+            j = line.find('"', i)
+            if j < 0:
+                return True
+            if line.startswith('"', j + 1):
+                i = j + 2
+                continue
+            quoted = False
+            i = j + 1
+        else:
+            j = line.find('"', i)
+            if j < 0:
+                return False
+            quoted = j == 0 or line[j - 1] == ","
+            i = j + 1
+    return quoted
+
+
+class RecordSplitter:
+    """Groups CSV lines into records, joining lines while a quoted field is open.
+
+    A record still open after BULK_MAX_RECORD_CHARS (usually a stray quote) is
+    reported against its first line, and the lines after it are split again, so only
+    that row fails. Quote state is carried from line to line rather than rescanned.
+    """
+
+    def __init__(self):
+        self.lines: list[tuple[int, str]] = []
+        self.quoted = False
+        self.length = 0
+
+    def reset(self):
+        self.lines = []
+        self.quoted = False
+        self.length = 0
+
+    def abandon(self, queue: deque):
+        start = self.lines[0][0]
+        queue.extendleft(reversed(self.lines[1:]))
+        self.reset()
+        return start, RecordError("Unterminated quoted field")
+
+    def feed(self, line_no: int, line: str | RecordError):
+        """(first line number, record text or RecordError) for each record completed by line."""
+        out = []
+        queue = deque([(line_no, line)])
+        while queue:
+            line_no, line = queue.popleft()
+            if isinstance(line, RecordError):
+                if self.lines:
+                    queue.appendleft((line_no, line))
+                    out.append(self.abandon(queue))
+                else:
+                    out.append((line_no, line))
+                continue
+            self.lines.append((line_no, line))
+            self.quoted = ends_quoted(line, self.quoted)
+            self.length += len(line) + 1
+            if not self.quoted:
+                out.append((self.lines[0][0], "\n".join(text for _, text in self.lines)))
+                self.reset()
+            elif self.length > BULK_MAX_RECORD_CHARS:
+                out.append(self.abandon(queue))
+        return out
+
+    def finish(self):
+        out = []
+        while self.lines:
+            queue = deque()
+            out.append(self.abandon(queue))
+            for line_no, line in queue:
+                out.extend(self.feed(line_no, line))
+        return out
+
+
+async def iter_csv_records(chunks: AsyncIterator[bytes]):
+    """Yield (line number, dict or RecordError) per CSV record, keyed by the header row.
+
+    Quoted fields may span lines (see RecordSplitter) without the whole upload
+    ever being held in memory.
+    """
+    header = None
+
+    def records(splits):
+        nonlocal header
+        for start_line, text in splits:
+            if isinstance(text, RecordError):
+                yield start_line, text
+                continue
+            if not text.strip():
+                continue
+            try:
+                values = next(csv.reader([text]))
+            except csv.Error as e:
+                yield start_line, RecordError(f"Invalid CSV: {e}")
+                continue
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            if len(values) != len(header):
+                yield start_line, RecordError(f"Expected {len(header)} columns, got {len(values)}")
+                continue
+            yield start_line, dict(zip(header, values))
+
+    splitter = RecordSplitter()
+    line_no = 0
+    async for line in iter_lines(chunks):
+        line_no += 1
+        for record in records(splitter.feed(line_no, line)):
+            yield record
+    for record in records(splitter.finish()):
+        yield record
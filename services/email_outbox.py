@@ -0,0 +1,249 @@
+import os
+import time
+import asyncio
+import logging
+import smtplib
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from database import get_connection
+from metrics import Histogram
+
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+# Close the SMTP session after this many idle seconds rather than let the server drop it.
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", "60"))
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "2"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_RETRY_BASE = float(os.getenv("OUTBOX_RETRY_BASE", "5"))
+OUTBOX_RETRY_MAX = float(os.getenv("OUTBOX_RETRY_MAX", "3600"))
+# Claimed rows become visible to other senders again if not resolved within this many seconds.
+OUTBOX_LEASE = float(os.getenv("OUTBOX_LEASE", "120"))
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPSession:
+    """A single long-lived SMTP connection, reused across batches and reopened when it drops."""
+
+    def __init__(self):
+        self.server = None
+        self.last_used = 0.0
+        self.sender_email = os.getenv("SMTP_EMAIL")
+        self.sender_password = os.getenv("SMTP_PASSWORD")
+
+    def connect(self):
+        server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        if SMTP_STARTTLS:
+            server.starttls()
+        if self.sender_password:
+            server.login(self.sender_email, self.sender_password)
+        self.server = server
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self.server = None
+
+    def ensure_connected(self):
+        if self.server is not None and time.monotonic() - self.last_used > SMTP_IDLE_TIMEOUT:
+            self.close()
+        if self.server is not None:
+            try:
+                if self.server.noop()[0] == 250:
+                    return
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.close()
+        self.connect()
+
+    def build_message(self, recipient, subject, body_text, body_html):
+        msg = MIMEMultipart("alternative")
+        msg['From'] = self.sender_email
+        msg['To'] = recipient
+        msg['Subject'] = subject
+        msg['Reply-To'] = self.sender_email
+        msg.attach(MIMEText(body_text, 'plain'))
+        if body_html:
+            msg.attach(MIMEText(body_html, 'html'))
+        return msg
+
+    def send_batch(self, rows):
+        """Send every row over one session. Returns {id: error message or None}."""
+        results = {}
+        try:
+            self.ensure_connected()
+        except (smtplib.SMTPException, OSError) as e:
+            return {row[0]: f"connect failed: {e}" for row in rows}
+
+        for id, recipient, subject, body_text, body_html in rows:
+            msg = self.build_message(recipient, subject, body_text, body_html)
+            try:
+                self.server.sendmail(self.sender_email, recipient, msg.as_string())
+                results[id] = None
+            except smtplib.SMTPServerDisconnected:
+                # Reconnect once and retry; anything further waits for the next batch.
+                try:
+                    self.connect()
+                    self.server.sendmail(self.sender_email, recipient, msg.as_string())
+                    results[id] = None
+                except (smtplib.SMTPException, OSError) as e:
+                    results[id] = str(e)
+            except (smtplib.SMTPException, OSError) as e:
+                results[id] = str(e)
+        self.last_used = time.monotonic()
+        return results
+
+
+class EmailOutbox:
+    def __init__(self):
+        self.session = SMTPSession()
+        # One thread owns the SMTP socket so sends never interleave.
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smtp")
+        self.wakeup = None
+        self.task = None
+        self.delivery_latency = Histogram(buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600))
+        self.sent = 0
+        # Failed deliveries: retried ones will be attempted again, failed ones reached OUTBOX_MAX_ATTEMPTS.
+        self.retried = 0
+        self.failed = 0
+
+    async def enqueue(self, recipient: str, subject: str, body_text: str, body_html: str | None = None):
+        async with get_connection() as conn:
+            await conn.execute(
+                "INSERT INTO email_outbox (recipient, subject, body_text, body_html) VALUES (%s, %s, %s, %s)",
+                (recipient, subject, body_text, body_html)
+            )
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    async def claim_batch(self):
+        async with get_connection() as conn:
+            cursor = await conn.execute(
+                """
+                UPDATE email_outbox
+                SET next_attempt_at = now() + make_interval(secs => %s)
+                WHERE id IN (
+                    SELECT id FROM email_outbox
+                    WHERE sent_at IS NULL AND failed_at IS NULL AND next_attempt_at <= now()
+                    ORDER BY next_attempt_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, recipient, subject, body_text, body_html, attempts, created_at
+                """,
+                (OUTBOX_LEASE, OUTBOX_BATCH_SIZE)
+            )
+            return await cursor.fetchall()
+
+    async def process_batch(self):
+        rows = await self.claim_batch()
+        if not rows:
+            return 0
+
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(self.executor, self.session.send_batch, [row[:5] for row in rows])
+
+        sent_ids = [row[0] for row in rows if results.get(row[0]) is None]
+        failures = []
+        given_up = 0
+        for id, _, _, _, _, attempts, _ in rows:
+            error = results.get(id)
+            if error is not None:
+                delay = min(OUTBOX_RETRY_BASE * 2 ** attempts, OUTBOX_RETRY_MAX)
+                failures.append((error, delay, OUTBOX_MAX_ATTEMPTS, id))
+                given_up += attempts + 1 >= OUTBOX_MAX_ATTEMPTS
+
+        async with get_connection() as conn:
+            if sent_ids:
+                cursor = await conn.execute(
+                    "UPDATE email_outbox SET sent_at = now(), attempts = attempts + 1 WHERE id = ANY(%s) RETURNING extract(epoch FROM sent_at - created_at)",
+                    (sent_ids,)
+                )
+                for (latency,) in await cursor.fetchall():
+                    self.delivery_latency.observe(float(latency))
+                self.sent += len(sent_ids)
+            if failures:
+                async with conn.cursor() as cursor:
+                    await cursor.executemany(
+                        """
+                        UPDATE email_outbox
+                        SET attempts = attempts + 1,
+                            last_error = %s,
+                            next_attempt_at = now() + make_interval(secs => %s),
+                            failed_at = CASE WHEN attempts + 1 >= %s THEN now() END
+                        WHERE id = %s
+                        """,
+                        failures
+                    )
+                self.failed += given_up
+                self.retried += len(failures) - given_up
+                for error, _, _, id in failures:
+                    logger.warning("Email %s not delivered: %s", id, error)
+        return len(rows)
+
+    async def run(self):
+        while True:
+            try:
+                if await self.process_batch() == OUTBOX_BATCH_SIZE:
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Email outbox batch failed")
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self.task is None:
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.session.close)
+
+    async def pending(self):
+        """(undelivered emails still to be attempted, age in seconds of the oldest of them)."""
+        async with get_connection() as conn:
+            cursor = await conn.execute(
+                """
+                SELECT count(*), coalesce(extract(epoch FROM now() - min(created_at)), 0)
+                FROM email_outbox
+                WHERE sent_at IS NULL AND failed_at IS NULL
+                """
+            )
+            pending, oldest_pending = await cursor.fetchone()
+        return pending, float(oldest_pending)
+
+    async def stats(self):
+        pending, oldest_pending = await self.pending()
+        return {
+            "pending": pending,
+            "oldest_pending_seconds": oldest_pending,
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "delivery_latency_seconds": self.delivery_latency.snapshot()
+        }
+
+
+email_outbox = EmailOutbox()
@@ -0,0 +1,85 @@
+import os
+import json
+import asyncio
+import httpx
+from functools import lru_cache
+from google_auth_oauthlib.flow import Flow
+
+GOOGLE_CLIENT_SECRETS_FILE = os.getenv("GOOGLE_CLIENT_SECRETS_FILE", "credentials.json")
+GOOGLE_REDIRECT_URI = os.getenv("GOOGLE_REDIRECT_URI", "http://localhost:3000/auth/callback")
+# Endpoint overrides let a local fake server stand in for Google in tests and benchmarks.
+GOOGLE_TOKEN_URL = os.getenv("GOOGLE_TOKEN_URL")
+GOOGLE_USERINFO_URL = os.getenv("GOOGLE_USERINFO_URL", "https://www.googleapis.com/userinfo/v2/me")
+GOOGLE_PEOPLE_URL = os.getenv("GOOGLE_PEOPLE_URL", "https://people.googleapis.com/v1/people/me?personFields=phoneNumbers")
+GOOGLE_HTTP_TIMEOUT = float(os.getenv("GOOGLE_HTTP_TIMEOUT", "10"))
+GOOGLE_HTTP_MAX_CONNECTIONS = int(os.getenv("GOOGLE_HTTP_MAX_CONNECTIONS", "100"))
+
+SCOPES = [
+    "https://www.googleapis.com/auth/userinfo.profile",
+    "https://www.googleapis.com/auth/userinfo.email",
+    "openid",
+    "https://www.googleapis.com/auth/user.phonenumbers.read"
+]
+
+
+@lru_cache(maxsize=1)
+def client_config():
+    """The OAuth client secrets, read from disk once per process."""
+    with open(GOOGLE_CLIENT_SECRETS_FILE) as f:
+        return json.load(f)
+
+
+def client_settings():
+    config = client_config()
+    return config.get("web") or config["installed"]
+
+
+def create_google_flow():
+    return Flow.from_client_config(client_config(), scopes=SCOPES, redirect_uri=GOOGLE_REDIRECT_URI)
+
+
+class GoogleOAuthClient:
+    """Token exchange and profile lookups over one shared, connection-pooled httpx client."""
+
+    def __init__(self):
+        self.client = None
+
+    def http(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                timeout=GOOGLE_HTTP_TIMEOUT,
+                limits=httpx.Limits(max_connections=GOOGLE_HTTP_MAX_CONNECTIONS, max_keepalive_connections=GOOGLE_HTTP_MAX_CONNECTIONS)
+            )
+        return self.client
+
+    async def exchange_code(self, code: str):
+        settings = client_settings()
+        data = {
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": GOOGLE_REDIRECT_URI,
+            "client_id": settings["client_id"],
+            "client_secret": settings["client_secret"],
+        }
+        response = await self.http().post(GOOGLE_TOKEN_URL or settings["token_uri"], data=data)
+        response.raise_for_status()
+        return response.json()
+
+    async def fetch_profile(self, access_token: str):
+        """Fetch (userinfo, people) concurrently."""
+        headers = {"Authorization": f"Bearer {access_token}"}
+
+        async def get(url):
+            response = await self.http().get(url, headers=headers)
+            response.raise_for_status()
+            return response.json()
+
+        return await asyncio.gather(get(GOOGLE_USERINFO_URL), get(GOOGLE_PEOPLE_URL))
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+
+google_oauth = GoogleOAuthClient()
@@ -0,0 +1,220 @@
+import os
+import uuid
+import asyncio
+import hashlib
+import logging
+import aiofiles
+import aiofiles.os
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from PIL import Image, ImageOps
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+MEDIA_ROOT = os.path.abspath(os.getenv("MEDIA_ROOT", "media"))
+MEDIA_MAX_BYTES = int(os.getenv("MEDIA_MAX_BYTES", str(10 * 1024 * 1024)))
+MEDIA_MAX_FILES = int(os.getenv("MEDIA_MAX_FILES", "20"))
+# Longest edge of each generated thumbnail, in pixels.
+THUMBNAIL_SIZES = tuple(int(size) for size in os.getenv("THUMBNAIL_SIZES", "320,960").split(","))
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+
+# Leading bytes of the formats we accept; the client's Content-Type is not trusted.
+SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+)
+
+logger = logging.getLogger(__name__)
+
+
+def sniff(head: bytes):
+    for signature, content_type in SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def original_path(digest: str):
+    # Two levels of fan-out keep directories small; the name is the content hash, so files never change.
+    return os.path.join(MEDIA_ROOT, "originals", digest[:2], digest[2:4], digest)
+
+
+def thumbnail_path(digest: str, size: int):
+    return os.path.join(MEDIA_ROOT, "thumbs", str(size), digest[:2], digest[2:4], f"{digest}.jpg")
+
+
+class SpooledPart:
+    """One file part being written to a temp file while it is hashed and size-checked."""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.temp_path = os.path.join(MEDIA_ROOT, "tmp", uuid.uuid4().hex)
+        self.file = None
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.head = b""
+
+    async def open(self):
+        self.file = await aiofiles.open(self.temp_path, "wb")
+
+    async def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > MEDIA_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Each photo must be at most {MEDIA_MAX_BYTES} bytes")
+        if len(self.head) < 16:
+            self.head += data[:16]
+        self.hasher.update(data)
+        await self.file.write(data)
+
+    async def close(self):
+        if self.file is not None:
+            await self.file.close()
+            self.file = None
+
+    async def discard(self):
+        await self.close()
+        try:
+            await aiofiles.os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+    async def commit(self):
+        """Move the upload to its content-addressed path; an identical file already stored wins."""
+        await self.close()
+        content_type = sniff(self.head)
+        if content_type is None:
+            raise HTTPException(status_code=415, detail=f"{self.filename or 'Upload'} is not a JPEG, PNG or WebP image")
+        digest = self.hasher.hexdigest()
+        path = original_path(digest)
+        if await aiofiles.os.path.exists(path):
+            await aiofiles.os.remove(self.temp_path)
+        else:
+            await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+            await aiofiles.os.replace(self.temp_path, path)
+        return {"sha256": digest, "content_type": content_type, "size": self.size}
+
+
+async def receive_photos(chunks, content_type: str):
+    """Stream a multipart/form-data body to disk part by part; returns one dict per stored file.
+
+    python-multipart's parser is push-based with synchronous callbacks, so the
+    callbacks only queue events for the current network chunk and the awaits
+    (file writes) happen between chunks. Memory use is bounded by the chunk size.
+    """
+    media_type, options = parse_options_header(content_type)
+    boundary = options.get(b"boundary")
+    if media_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=415, detail="Upload photos as multipart/form-data")
+
+    events = []
+    header = {"field": b"", "value": b""}
+    headers = {}
+
+    def on_header_field(data, start, end):
+        header["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        header["value"] += data[start:end]
+
+    def on_header_end():
+        headers[header["field"].decode("latin-1").lower()] = header["value"]
+        header["field"] = header["value"] = b""
+
+    def on_headers_finished():
+        events.append(("part", dict(headers)))
+        headers.clear()
+
+    def on_part_data(data, start, end):
+        events.append(("data", bytes(data[start:end])))
+
+    def on_part_end():
+        events.append(("end", None))
+
+    parser = MultipartParser(boundary, {
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    await aiofiles.os.makedirs(os.path.join(MEDIA_ROOT, "tmp"), exist_ok=True)
+    stored = []
+    current = None
+    try:
+        async for chunk in chunks:
+            parser.write(chunk)
+            for kind, value in events:
+                if kind == "part":
+                    _, disposition = parse_options_header(value.get("content-disposition"))
+                    if b"filename" in disposition:
+                        if len(stored) >= MEDIA_MAX_FILES:
+                            raise HTTPException(status_code=413, detail=f"At most {MEDIA_MAX_FILES} photos per upload")
+                        current = SpooledPart(disposition[b"filename"].decode(errors="replace"))
+                        await current.open()
+                elif kind == "data" and current is not None:
+                    await current.write(value)
+                elif kind == "end" and current is not None:
+                    stored.append(await current.commit())
+                    current = None
+            events.clear()
+        parser.finalize()
+    except BaseException:
+        if current is not None:
+            await current.discard()
+        raise
+    if not stored:
+        raise HTTPException(status_code=400, detail="No photo files in upload")
+    return stored
+
+
+def render_thumbnails(digest: str):
+    with Image.open(original_path(digest)) as image:
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        for size in THUMBNAIL_SIZES:
+            path = thumbnail_path(digest, size)
+            if os.path.exists(path):
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            thumb = image.copy()
+            thumb.thumbnail((size, size))
+            temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            thumb.save(temp_path, "JPEG", quality=82, optimize=True, progressive=True)
+            os.replace(temp_path, path)
+
+
+class ThumbnailQueue:
+    """Renders thumbnails on a small thread pool so uploads return as soon as originals are stored."""
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="thumbs")
+        self.pending: dict[str, asyncio.Future] = {}
+
+    def render(self, digest: str):
+        """Start (or join) rendering for digest and return the future."""
+        future = self.pending.get(digest)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, render_thumbnails, digest)
+            self.pending[digest] = future
+            future.add_done_callback(lambda f: self.finished(digest, f))
+        return future
+
+    def finished(self, digest, future):
+        self.pending.pop(digest, None)
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("Thumbnail rendering failed for %s", digest, exc_info=future.exception())
+
+    async def ensure(self, digest: str, size: int):
+        """Path of a thumbnail, rendering it now if the background job hasn't produced it yet."""
+        path = thumbnail_path(digest, size)
+        if not await aiofiles.os.path.exists(path):
+            await asyncio.shield(self.render(digest))
+        return path
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+thumbnail_queue = ThumbnailQueue()
@@ -0,0 +1,177 @@
+import os
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from cachetools import TTLCache
+from database import get_connection
+
+OTP_STORE = os.getenv("OTP_STORE", "postgres")
+OTP_TTL_MINUTES = int(os.getenv("OTP_TTL_MINUTES", "5"))
+# Verifications allowed per code. Counted with the code itself, so the limit holds across
+# workers and concurrent guesses; sending a new code starts a fresh count.
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", "5"))
+# How long this worker answers a locked-out email from memory, without a query. A new code sent
+# through another worker is only accepted here once this expires.
+OTP_LOCK_CACHE_TTL = float(os.getenv("OTP_LOCK_CACHE_TTL", "60"))
+OTP_SWEEP_INTERVAL = float(os.getenv("OTP_SWEEP_INTERVAL", "300"))
+OTP_SWEEP_BATCH = int(os.getenv("OTP_SWEEP_BATCH", "5000"))
+
+VERIFIED = "verified"
+NOT_FOUND = "not_found"
+EXPIRED = "expired"
+MISMATCH = "mismatch"
+LOCKED = "locked"
+
+logger = logging.getLogger(__name__)
+
+# Counts the attempt on the newest unused code and consumes it if it matches, is unexpired and
+# was within OTP_MAX_ATTEMPTS. Concurrent guesses queue on the row lock and are evaluated against
+# the committed row, so at most OTP_MAX_ATTEMPTS of them are ever compared. The code is matched
+# by created_at rather than ctid, which changes with every update. No row: no unused code, or
+# one consumed by a concurrent request.
+VERIFY_OTP = """
+UPDATE OTPs SET
+    attempts = attempts + 1,
+    is_used = attempts < %(max_attempts)s AND otp = %(otp)s AND expires_at > %(now)s
+WHERE email = %(email)s AND is_used = FALSE
+    AND created_at = (SELECT created_at FROM OTPs WHERE email = %(email)s AND is_used = FALSE ORDER BY created_at DESC LIMIT 1)
+RETURNING attempts > %(max_attempts)s AS locked, is_used, expires_at > %(now)s AS valid
+"""
+
+
+class OTPStore(ABC):
+    def __init__(self):
+        self.task = None
+
+    @abstractmethod
+    async def store(self, email: str, otp: str):
+        ...
+
+    @abstractmethod
+    async def verify_and_consume(self, email: str, otp: str):
+        """Check the newest unused code for email and mark it used if it matches; returns an outcome constant.
+
+        Each call counts against the code's OTP_MAX_ATTEMPTS; past that it returns LOCKED without comparing.
+        """
+
+    @abstractmethod
+    async def sweep_expired(self):
+        ...
+
+    async def run_sweeper(self):
+        while True:
+            await asyncio.sleep(OTP_SWEEP_INTERVAL)
+            try:
+                removed = await self.sweep_expired()
+                if removed:
+                    logger.info("Swept %s expired OTPs", removed)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("OTP sweep failed")
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run_sweeper())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+
+class PostgresOTPStore(OTPStore):
+    def __init__(self):
+        super().__init__()
+        # Emails whose newest code is out of attempts, so brute-force traffic stays off the database.
+        self.locked = TTLCache(maxsize=100_000, ttl=OTP_LOCK_CACHE_TTL)
+
+    async def store(self, email: str, otp: str):
+        now = datetime.utcnow()
+        async with get_connection() as conn:
+            await conn.execute(
+                """
+                INSERT INTO OTPs (email, otp, created_at, expires_at, is_used)
+                VALUES (%s, %s, %s, %s, %s)
+                """,
+                (email, otp, now, now + timedelta(minutes=OTP_TTL_MINUTES), False)
+            )
+        self.locked.pop(email, None)
+
+    async def verify_and_consume(self, email: str, otp: str):
+        if email in self.locked:
+            return LOCKED
+        async with get_connection() as conn:
+            cursor = await conn.execute(VERIFY_OTP, {"email": email, "otp": otp, "now": datetime.utcnow(), "max_attempts": OTP_MAX_ATTEMPTS})
+            row = await cursor.fetchone()
+
+        if row is None:
+            return NOT_FOUND
+        locked, consumed, valid = row
+        if locked:
+            self.locked[email] = True
+            return LOCKED
+        if consumed:
+            return VERIFIED
+        if not valid:
+            return EXPIRED
+        return MISMATCH
+
+    async def sweep_expired(self):
+        removed = 0
+        while True:
+            async with get_connection() as conn:
+                cursor = await conn.execute(
+                    """
+                    DELETE FROM OTPs
+                    WHERE ctid IN (SELECT ctid FROM OTPs WHERE expires_at < %s LIMIT %s)
+                    """,
+                    (datetime.utcnow(), OTP_SWEEP_BATCH)
+                )
+                removed += cursor.rowcount
+            if cursor.rowcount < OTP_SWEEP_BATCH:
+                return removed
+            # Yield between batches so the sweep never monopolises a connection.
+            await asyncio.sleep(0)
+
+
+class MemoryOTPStore(OTPStore):
+    """Keeps only the newest code per email in process memory; for single-worker deployments."""
+
+    def __init__(self):
+        super().__init__()
+        # email -> [code, expires_at, attempts]
+        self.codes: dict[str, list] = {}
+
+    async def store(self, email: str, otp: str):
+        self.codes[email] = [otp, datetime.utcnow() + timedelta(minutes=OTP_TTL_MINUTES), 0]
+
+    async def verify_and_consume(self, email: str, otp: str):
+        entry = self.codes.get(email)
+        if entry is None:
+            return NOT_FOUND
+        stored_otp, expires_at, attempts = entry
+        if attempts >= OTP_MAX_ATTEMPTS:
+            return LOCKED
+        entry[2] += 1
+        if datetime.utcnow() > expires_at:
+            return EXPIRED
+        if stored_otp != otp:
+            return MISMATCH
+        del self.codes[email]
+        return VERIFIED
+
+    async def sweep_expired(self):
+        now = datetime.utcnow()
+        expired = [email for email, (_, expires_at, _) in self.codes.items() if expires_at < now]
+        for email in expired:
+            del self.codes[email]
+        return len(expired)
+
+
+otp_store = MemoryOTPStore() if OTP_STORE == "memory" else PostgresOTPStore()
@@ -0,0 +1,273 @@
+import os
+import asyncio
+import logging
+import orjson
+import psycopg
+from collections import defaultdict
+from fastapi import HTTPException
+from psycopg.rows import dict_row
+from schema.user_schema import User
+from schema.home_schema import SavedSearchCreate
+from database import CONNINFO, get_connection
+from services.buildings import BUILDING_COLUMNS, building_crud
+
+SAVED_SEARCH_LIMIT = int(os.getenv("SAVED_SEARCH_LIMIT", "20"))
+# Matches buffered per open stream; a client that falls further behind misses the overflow.
+SAVED_SEARCH_QUEUE_SIZE = int(os.getenv("SAVED_SEARCH_QUEUE_SIZE", "100"))
+# Listings re-checked for a stream that reconnects with Last-Event-ID.
+SAVED_SEARCH_REPLAY = int(os.getenv("SAVED_SEARCH_REPLAY", "200"))
+SAVED_SEARCH_RECONNECT_MAX = float(os.getenv("SAVED_SEARCH_RECONNECT_MAX", "30"))
+
+SEARCH_FIELDS = ("id", "name", "min_price", "max_price", "bedroom_no", "property_type", "purpose", "location")
+SEARCH_COLUMNS = ", ".join(SEARCH_FIELDS)
+# Price bands are powers of two: band n holds prices below 2**n. Prices past 2**47 share the top band,
+# and listings without a price sit in band 0.
+MAX_BAND = 48
+ANY = None
+
+logger = logging.getLogger(__name__)
+
+
+def price_band(price: int | None):
+    return min(max(price or 0, 0).bit_length(), MAX_BAND)
+
+
+def search_matches(search: dict, building: dict):
+    """The exact predicate, with the same equality semantics as the /buildings/ filters."""
+    price = building["price"]
+    if search["min_price"] is not None and (price is None or price < search["min_price"]):
+        return False
+    if search["max_price"] is not None and (price is None or price > search["max_price"]):
+        return False
+    for field in ("bedroom_no", "property_type", "purpose"):
+        if search[field] and building[field] != search[field]:
+            return False
+    if search["location"] and search["location"].lower() not in (building["address"] or "").lower():
+        return False
+    return True
+
+
+class SavedSearchService:
+
+    @staticmethod
+    async def create_search(search: SavedSearchCreate, current_user: User):
+        async with get_connection() as conn:
+            async with conn.transaction():
+                # Creates for one user queue on their Users row, so concurrent ones can't all pass the count check.
+                await conn.execute("SELECT 1 FROM Users WHERE email = %s FOR NO KEY UPDATE", (current_user.email,))
+                cursor = conn.cursor(row_factory=dict_row)
+                await cursor.execute(
+                    f"""
+                    INSERT INTO saved_searches (user_email, name, min_price, max_price, bedroom_no, property_type, purpose, location)
+                    SELECT %s, %s, %s, %s, %s, %s, %s, %s
+                    WHERE (SELECT count(*) FROM saved_searches WHERE user_email = %s) < %s
+                    RETURNING {SEARCH_COLUMNS}
+                    """,
+                    (current_user.email, search.name, search.min_price, search.max_price, search.bedroom_no or None, search.property_type or None, search.purpose or None, search.location or None, current_user.email, SAVED_SEARCH_LIMIT)
+                )
+                created = await cursor.fetchone()
+        if created is None:
+            raise HTTPException(status_code=400, detail=f"Message: You can keep at most {SAVED_SEARCH_LIMIT} saved searches")
+        return created
+
+    @staticmethod
+    async def list_searches(current_user: User):
+        async with get_connection() as conn:
+            cursor = conn.cursor(row_factory=dict_row)
+            await cursor.execute(f"SELECT {SEARCH_COLUMNS} FROM saved_searches WHERE user_email = %s ORDER BY id", (current_user.email,))
+            return await cursor.fetchall()
+
+    @staticmethod
+    async def delete_search(id: int, current_user: User):
+        async with get_connection() as conn:
+            cursor = await conn.execute("DELETE FROM saved_searches WHERE id = %s AND user_email = %s RETURNING id", (id, current_user.email))
+            if await cursor.fetchone() is None:
+                raise HTTPException(status_code=404, detail="Message: Saved search not found")
+        return f"Saved search {id} deleted"
+
+
+class SearchIndex:
+    """Saved searches bucketed by (property_type, purpose, bedroom_no, price band), so a new
+    listing is only checked against searches that could match it rather than against all of them.
+
+    A search sits in every band its price range overlaps, keyed by its own value for each
+    field or ANY where it has none; a listing looks in the eight buckets its own values
+    (or ANY of each) select at its price's band.
+    """
+
+    def __init__(self):
+        self.buckets: dict[tuple[str | None, str | None, str | None, int], dict[int, dict]] = defaultdict(dict)
+        self.searches: dict[int, dict] = {}
+
+    def __len__(self):
+        return len(self.searches)
+
+    def keys(self, search: dict):
+        low = price_band(search["min_price"] or 0)
+        high = MAX_BAND if search["max_price"] is None else price_band(search["max_price"])
+        return [(search["property_type"] or ANY, search["purpose"] or ANY, search["bedroom_no"] or ANY, band) for band in range(low, high + 1)]
+
+    def add(self, search: dict):
+        self.remove(search["id"])
+        self.searches[search["id"]] = search
+        for key in self.keys(search):
+            self.buckets[key][search["id"]] = search
+
+    def remove(self, id: int):
+        search = self.searches.pop(id, None)
+        if search is None:
+            return
+        for key in self.keys(search):
+            bucket = self.buckets[key]
+            bucket.pop(id, None)
+            if not bucket:
+                del self.buckets[key]
+
+    def match(self, building: dict):
+        band = price_band(building["price"])
+        types = {ANY, building["property_type"] or ANY}
+        purposes = {ANY, building["purpose"] or ANY}
+        bedrooms = {ANY, building["bedroom_no"] or ANY}
+        candidates = [self.buckets.get((type, purpose, bedroom, band), {}) for type in types for purpose in purposes for bedroom in bedrooms]
+        return [search for bucket in candidates for search in bucket.values() if search_matches(search, building)]
+
+
+class SearchAlerts:
+    """Pushes newly inserted listings to the open match streams of users whose saved searches they satisfy.
+
+    Each worker LISTENs on a dedicated connection (outside the pool) for the
+    building_inserted and saved_searches_changed notifications sent by the
+    triggers in migrations/0013, so inserts made by any worker, bulk imports
+    included, reach every stream. Only the searches of users with a stream open
+    on this worker are indexed here.
+    """
+
+    def __init__(self):
+        self.index = SearchIndex()
+        self.subscribers: dict[str, set[asyncio.Queue]] = {}
+        self.user_searches: dict[str, list[int]] = {}
+        self.reconnect_delay = 1.0
+        self.task = None
+
+    async def load_user(self, email: str):
+        async with get_connection() as conn:
+            cursor = conn.cursor(row_factory=dict_row)
+            await cursor.execute(f"SELECT user_email, {SEARCH_COLUMNS} FROM saved_searches WHERE user_email = %s", (email,))
+            searches = await cursor.fetchall()
+        if email not in self.subscribers:
+            # The last stream closed while the query ran.
+            return
+        self.drop_user(email)
+        for search in searches:
+            self.index.add(search)
+        self.user_searches[email] = [search["id"] for search in searches]
+
+    def drop_user(self, email: str):
+        for id in self.user_searches.pop(email, ()):
+            self.index.remove(id)
+
+    async def subscribe(self, email: str):
+        queue = asyncio.Queue(maxsize=SAVED_SEARCH_QUEUE_SIZE)
+        first = email not in self.subscribers
+        self.subscribers.setdefault(email, set()).add(queue)
+        if first:
+            try:
+                await self.load_user(email)
+            except BaseException:
+                self.unsubscribe(email, queue)
+                raise
+        return queue
+
+    def unsubscribe(self, email: str, queue: asyncio.Queue):
+        queues = self.subscribers.get(email)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self.subscribers[email]
+            self.drop_user(email)
+
+    def user_matches(self, buildings: list[dict]):
+        """{email: [(building, [matched searches])]} for subscribed users."""
+        matches = defaultdict(list)
+        for building in buildings:
+            by_user = defaultdict(list)
+            for search in self.index.match(building):
+                by_user[search["user_email"]].append({"id": search["id"], "name": search["name"]})
+            for email, searches in by_user.items():
+                matches[email].append((building, searches))
+        return matches
+
+    @staticmethod
+    def event(building: dict, searches: list[dict]):
+        return building["id"], orjson.dumps({"building": building, "searches": searches})
+
+    def publish(self, buildings: list[dict]):
+        for email, matched in self.user_matches(buildings).items():
+            for queue in self.subscribers.get(email, ()):
+                for building, searches in matched:
+                    try:
+                        queue.put_nowait(self.event(building, searches))
+                    except asyncio.QueueFull:
+                        logger.warning("Dropped a saved-search match for a slow stream of %s", email)
+
+    async def replay(self, email: str, after_id: int):
+        """Matches among listings inserted after after_id, for a stream resuming with Last-Event-ID."""
+        async with get_connection() as conn:
+            cursor = conn.cursor(row_factory=dict_row)
+            await cursor.execute(f"SELECT {BUILDING_COLUMNS} FROM Buildings WHERE id > %s ORDER BY id LIMIT %s", (after_id, SAVED_SEARCH_REPLAY))
+            buildings = await cursor.fetchall()
+        return [self.event(building, searches) for building, searches in self.user_matches(buildings).get(email, ())]
+
+    async def handle(self, channel: str, payload: str):
+        if channel == "building_inserted":
+            if not self.index:
+                return
+            ids = [int(id) for id in payload.split(",") if id]
+            self.publish(await building_crud.get_buildings(ids))
+        elif channel == "saved_searches_changed" and payload in self.subscribers:
+            await self.load_user(payload)
+
+    async def listen(self):
+        async with await psycopg.AsyncConnection.connect(CONNINFO, autocommit=True) as conn:
+            await conn.execute("LISTEN building_inserted")
+            await conn.execute("LISTEN saved_searches_changed")
+            self.reconnect_delay = 1.0
+            # Searches may have changed while disconnected.
+            for email in list(self.subscribers):
+                await self.load_user(email)
+            async for notify in conn.notifies():
+                try:
+                    await self.handle(notify.channel, notify.payload)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception("Handling %s notification failed", notify.channel)
+
+    async def run(self):
+        while True:
+            try:
+                await self.listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Saved-search listener lost its connection; reconnecting in %.0fs", self.reconnect_delay)
+            await asyncio.sleep(self.reconnect_delay)
+            self.reconnect_delay = min(self.reconnect_delay * 2, SAVED_SEARCH_RECONNECT_MAX)
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+
+saved_search_crud = SavedSearchService()
+search_alerts = SearchAlerts()
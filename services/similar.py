@@ -0,0 +1,195 @@
+import os
+import re
+import zlib
+import asyncio
+import logging
+import numpy as np
+from psycopg.rows import dict_row
+from database import get_connection
+from services.amenities import AMENITIES
+
+SIMILAR_REFRESH_INTERVAL = float(os.getenv("SIMILAR_REFRESH_INTERVAL", "30"))
+# Ids re-read below the highest loaded one on each refresh, since concurrent inserts can commit out of id order.
+SIMILAR_REFRESH_LOOKBACK = int(os.getenv("SIMILAR_REFRESH_LOOKBACK", "1000"))
+# Rows encoded per step of the initial load; each step runs on the event loop, so keep them short.
+SIMILAR_LOAD_BATCH = int(os.getenv("SIMILAR_LOAD_BATCH", "1000"))
+
+# Squared-distance weight of a unit difference in each feature. Price is log2, so one unit
+# is double the price; a category mismatch costs twice its weight (two one-hot slots differ).
+FEATURE_WEIGHTS = {
+    "price": 1.0,
+    "bedrooms": 0.5,
+    "bathrooms": 0.25,
+    "property_type": 1.0,
+    "purpose": 4.0,
+    "furnished": 0.5,
+    "amenities": 0.2,
+}
+CATEGORICAL = ("property_type", "purpose", "furnished")
+# One-hot slots per categorical field. Values get their own slot in first-seen order;
+# past that they share slots by hash, so keep this above the number of distinct values.
+CATEGORY_SLOTS = 8
+AMENITY_TERMS = {term: n for n, term in enumerate(sorted(AMENITIES))}
+
+PRICE, BEDROOMS, BATHROOMS = 0, 1, 2
+CATEGORY_OFFSET = 3
+AMENITY_OFFSET = CATEGORY_OFFSET + CATEGORY_SLOTS * len(CATEGORICAL)
+DIMENSIONS = AMENITY_OFFSET + len(AMENITY_TERMS)
+
+SCALE = np.zeros(DIMENSIONS, dtype=np.float32)
+SCALE[PRICE] = FEATURE_WEIGHTS["price"] ** 0.5
+SCALE[BEDROOMS] = FEATURE_WEIGHTS["bedrooms"] ** 0.5
+SCALE[BATHROOMS] = FEATURE_WEIGHTS["bathrooms"] ** 0.5
+for n, field in enumerate(CATEGORICAL):
+    SCALE[CATEGORY_OFFSET + n * CATEGORY_SLOTS:CATEGORY_OFFSET + (n + 1) * CATEGORY_SLOTS] = FEATURE_WEIGHTS[field] ** 0.5
+SCALE[AMENITY_OFFSET:] = FEATURE_WEIGHTS["amenities"] ** 0.5
+
+FEATURE_COLUMNS = "id, price, bedroom_no, bathroom_no, property_type, purpose, furnished, amenities"
+COUNT = re.compile(r"\d+")
+
+logger = logging.getLogger(__name__)
+
+
+def count(value):
+    # bedroom_no/bathroom_no are free text ("3", "3 bedrooms"); missing counts as 0.
+    match = COUNT.search(value or "")
+    return float(match.group()) if match else 0.0
+
+
+class SimilarListings:
+    """Every listing's feature vector in one float32 matrix, answering top-k queries with a single matrix-vector product.
+
+    Loaded in the background once the database is up, then kept current by
+    building_create and a periodic catch-up read of newer ids, which also picks
+    up rows inserted by bulk imports and other workers.
+    """
+
+    def __init__(self):
+        self.matrix = np.zeros((0, DIMENSIONS), dtype=np.float32)
+        self.ids = np.zeros(0, dtype=np.int64)
+        # Squared norm of each row, so distances need only one product with the query vector.
+        self.norms = np.zeros(0, dtype=np.float32)
+        self.size = 0
+        self.positions: dict[int, int] = {}
+        self.max_id = 0
+        self.slots: dict[str, dict[str, int]] = {field: {} for field in CATEGORICAL}
+        self.ready = False
+        self.task = None
+
+    def __contains__(self, id: int):
+        return id in self.positions
+
+    def category_slot(self, field: str, value: str | None):
+        value = " ".join((value or "").lower().split())
+        slots = self.slots[field]
+        slot = slots.get(value)
+        if slot is None:
+            slot = len(slots) if len(slots) < CATEGORY_SLOTS else zlib.crc32(value.encode()) % CATEGORY_SLOTS
+            slots[value] = slot
+        return slot
+
+    def encode(self, rows: list[dict]):
+        """Weighted feature vectors, one row per building, so squared Euclidean distance is the dissimilarity."""
+        vectors = np.zeros((len(rows), DIMENSIONS), dtype=np.float32)
+        for n, row in enumerate(rows):
+            vector = vectors[n]
+            vector[PRICE] = np.log2(max(row["price"] or 0, 0) + 1)
+            vector[BEDROOMS] = count(row["bedroom_no"])
+            vector[BATHROOMS] = count(row["bathroom_no"])
+            for m, field in enumerate(CATEGORICAL):
+                vector[CATEGORY_OFFSET + m * CATEGORY_SLOTS + self.category_slot(field, row[field])] = 1.0
+            for term in row["amenities"] or ():
+                if term in AMENITY_TERMS:
+                    vector[AMENITY_OFFSET + AMENITY_TERMS[term]] = 1.0
+        return vectors * SCALE
+
+    def reserve(self, needed: int):
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        matrix = np.zeros((capacity, DIMENSIONS), dtype=np.float32)
+        matrix[:self.size] = self.matrix[:self.size]
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[:self.size] = self.ids[:self.size]
+        norms = np.zeros(capacity, dtype=np.float32)
+        norms[:self.size] = self.norms[:self.size]
+        self.matrix, self.ids, self.norms = matrix, ids, norms
+
+    def upsert(self, rows: list[dict]):
+        if not rows:
+            return
+        vectors = self.encode(rows)
+        self.reserve(self.size + len(rows))
+        for row, vector in zip(rows, vectors):
+            position = self.positions.get(row["id"])
+            if position is None:
+                position = self.positions[row["id"]] = self.size
+                self.ids[position] = row["id"]
+                self.size += 1
+            self.matrix[position] = vector
+            self.norms[position] = vector @ vector
+            self.max_id = max(self.max_id, row["id"])
+
+    def top_k(self, id: int, k: int):
+        """Ids of the k listings nearest to id, nearest first."""
+        position = self.positions[id]
+        k = min(k, self.size - 1)
+        if k <= 0:
+            return []
+        # |x - q|^2 = |x|^2 - 2 x.q + |q|^2; the last term is the same for every row, so it is left out.
+        distances = self.matrix[:self.size] @ self.matrix[position]
+        distances *= -2
+        distances += self.norms[:self.size]
+        distances[position] = np.inf
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+        return self.ids[nearest].tolist()
+
+    async def load(self, after_id: int):
+        async with get_connection() as conn:
+            # Named (server-side) cursors only live inside a transaction.
+            async with conn.transaction():
+                async with conn.cursor(name="similar_listings", row_factory=dict_row) as cursor:
+                    await cursor.execute(f"SELECT {FEATURE_COLUMNS} FROM Buildings WHERE id > %s ORDER BY id", (after_id,))
+                    while rows := await cursor.fetchmany(SIMILAR_LOAD_BATCH):
+                        self.upsert(rows)
+
+    async def catch_up(self):
+        await self.load(max(self.max_id - SIMILAR_REFRESH_LOOKBACK, 0))
+
+    async def run(self):
+        while not self.ready:
+            try:
+                await self.load(0)
+                self.ready = True
+                logger.info("Loaded %s listings for similar-listing search", self.size)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Loading similar-listing features failed")
+                await asyncio.sleep(SIMILAR_REFRESH_INTERVAL)
+        while True:
+            await asyncio.sleep(SIMILAR_REFRESH_INTERVAL)
+            try:
+                await self.catch_up()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Refreshing similar-listing features failed")
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+
+similar_listings = SimilarListings()
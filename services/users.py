@@ -1,15 +1,13 @@
 from fastapi import HTTPException
 from fastapi.responses import JSONResponse
-from deps import pwd_context, get_user, hash_password
-from database import db_pool
+from deps import get_user, invalidate_user
+from passwords import hash_password, verify_password
+from database import get_connection
+from services.email_outbox import email_outbox
+from services.otp_store import otp_store, NOT_FOUND, EXPIRED, MISMATCH, LOCKED
 from schema.user_schema import UserCreate
 import random
 import string
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from datetime import datetime, timedelta
-import os
 
 class UserService:
     @staticmethod
@@ -17,9 +15,7 @@ class UserService:
         return ''.join(random.choices(string.digits, k=length))
 
     @staticmethod
-    def send_otp_email(email: str, otp: str):
-        sender_email = os.getenv("SMTP_EMAIL")
-        sender_password = os.getenv("SMTP_PASSWORD")
+    def render_otp_email(otp: str):
         subject = "Your OTP for Verification"
 
         plain_text = f"Your One-Time Password (OTP) is: {otp}\nIt is valid for 5 minutes."
@@ -36,88 +32,46 @@ class UserService:
             </body>
         </html>
         """
+        return subject, plain_text, html_content
 
-        msg = MIMEMultipart("alternative")
-        msg['From'] = sender_email
-        msg['To'] = email
-        msg['Subject'] = subject
-        msg['Reply-To'] = sender_email
-        msg.add_header('MIME-Version', '1.0')
-        msg.attach(MIMEText(plain_text, 'plain'))
-        msg.attach(MIMEText(html_content, 'html'))
-
+    @staticmethod
+    async def send_otp_email(email: str, otp: str):
+        subject, plain_text, html_content = UserService.render_otp_email(otp)
         try:
-            server = smtplib.SMTP('smtp.gmail.com', 587)
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.sendmail(sender_email, email, msg.as_string())
-            server.quit()
+            await email_outbox.enqueue(email, subject, plain_text, html_content)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to send OTP: {str(e)}")
 
     @staticmethod
-    def store_otp(email: str, otp: str):
-        conn = db_pool.getconn()
-        conn.autocommit = True
-        cursor = conn.cursor()
-        expires_at = datetime.utcnow() + timedelta(minutes=5)
+    async def store_otp(email: str, otp: str):
         try:
-            cursor.execute(
-                """
-                INSERT INTO OTPs (email, otp, created_at, expires_at, is_used)
-                VALUES (%s, %s, %s, %s, %s)
-                """,
-                (email, otp, datetime.utcnow(), expires_at, False)
-            )
-            conn.commit()
+            await otp_store.store(email, otp)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Failed to store OTP: {str(e)}")
 
     @staticmethod
-    def verify_otp(email: str, otp: str):
-        conn = db_pool.getconn()
-        conn.autocommit = True
-        cursor = conn.cursor()
-        try:
-            cursor.execute(
-                """
-                SELECT otp, expires_at, is_used
-                FROM OTPs
-                WHERE email = %s AND is_used = %s
-                ORDER BY created_at DESC
-                LIMIT 1
-                """,
-                (email, False)
-            )
-            result = cursor.fetchone()
-            if not result:
-                raise HTTPException(status_code=400, detail="Invalid or expired OTP")
-
-            stored_otp, expires_at, is_used = result
-            if datetime.utcnow() > expires_at:
-                raise HTTPException(status_code=400, detail="OTP has expired")
-            if stored_otp != otp:
-                raise HTTPException(status_code=400, detail="Incorrect OTP")
-            if is_used:
-                raise HTTPException(status_code=400, detail="OTP already used")
-
-            # Mark OTP as used
-            cursor.execute(
-                "UPDATE OTPs SET is_used = %s WHERE email = %s AND otp = %s",
-                (True, email, otp)
-            )
-            conn.commit()
-            cursor.close()
-            db_pool.putconn(conn)
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Failed to verify OTP: {str(e)}")
+    async def verify_otp(email: str, otp: str):
+        # The store counts the attempt in the same statement that checks it, so concurrent
+        # guesses from any worker can't get past OTP_MAX_ATTEMPTS, and answers emails it
+        # has already seen locked out without a query.
+        outcome = await otp_store.verify_and_consume(email, otp)
+
+        if outcome == LOCKED:
+            raise HTTPException(status_code=429, detail="Too many OTP attempts, please try again later")
+        if outcome == NOT_FOUND:
+            raise HTTPException(status_code=400, detail="Invalid or expired OTP")
+        if outcome == EXPIRED:
+            raise HTTPException(status_code=400, detail="OTP has expired")
+        if outcome == MISMATCH:
+            raise HTTPException(status_code=400, detail="Incorrect OTP")
 
     @staticmethod
-    def register_user(user_data: UserCreate):
-        conn = db_pool.getconn()
-        conn.autocommit = True
-        cursor = conn.cursor()
-        user = get_user(user_data.email)
+    async def register_user(user_data: UserCreate):
+        user = await get_user(user_data.email)
         if user:
             raise HTTPException(status_code=400, detail="Email Already Exists")
 
@@ -127,42 +81,43 @@ class UserService:
         if not user_data.password:
             raise HTTPException(status_code=400, detail="Invalid Password")
 
+        hashed_password = await hash_password(user_data.password)
+
         # Insert user into database
         try:
-            cursor.execute(
-                """
-                INSERT INTO Users (full_name, email, phone_number, account_type, subscribed, hashed_password)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                """,
-                (
-                    user_data.full_name,
-                    user_data.email,
-                    user_data.phone_number,
-                    user_data.account_type.value,
-                    user_data.subscribed,
-                    hash_password(user_data.password)
+            async with get_connection() as conn:
+                await conn.execute(
+                    """
+                    INSERT INTO Users (full_name, email, phone_number, account_type, subscribed, hashed_password)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    """,
+                    (
+                        user_data.full_name,
+                        user_data.email,
+                        user_data.phone_number,
+                        user_data.account_type.value,
+                        user_data.subscribed,
+                        hashed_password
+                    )
                 )
-            )
-            conn.commit()
-            cursor.close()
-            db_pool.putconn(conn)
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"Failed to commit to DB: {str(e)}")
+        invalidate_user(user_data.email)
 
         # Generate and send OTP
         otp = UserService.generate_otp()
-        UserService.store_otp(user_data.email, otp)
-        UserService.send_otp_email(user_data.email, otp)
+        await UserService.store_otp(user_data.email, otp)
+        await UserService.send_otp_email(user_data.email, otp)
 
         return {"message": "User successfully created. Please verify your email with the OTP sent."}
 
     @staticmethod
-    def reset_password(email:str, updated_password:str, confirm_password: str):
-        conn = db_pool.getconn()
-        conn.autocommit = True
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM Users WHERE email = %s",(email,))
-        user = cursor.fetchone()
+    async def reset_password(email:str, updated_password:str, confirm_password: str):
+        async with get_connection() as conn:
+            cursor = await conn.execute("SELECT * FROM Users WHERE email = %s",(email,))
+            user = await cursor.fetchone()
 
         if user is None:
             raise HTTPException(status_code=400, detail="Email Not Found")
@@ -171,16 +126,18 @@ class UserService:
 
         if not updated_password == confirm_password:
             raise HTTPException(status_code=400, detail="Updated Passwords don't Match")
-        elif pwd_context.verify(updated_password,user[6]):
+        elif (await verify_password(updated_password, user[6]))[0]:
             raise HTTPException(status_code=400, detail="Password is the same as old password")
 
+        hashed_password = await hash_password(updated_password)
         try:
-            cursor.execute("UPDATE Users SET hashed_password = %s WHERE email = %s",(hash_password(updated_password),email))
-            conn.commit()
-            cursor.close()
-            db_pool.putconn(conn)
+            async with get_connection() as conn:
+                await conn.execute("UPDATE Users SET hashed_password = %s WHERE email = %s",(hashed_password,email))
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=400, detail="Unable to change password: "+ str(e))
+        invalidate_user(email)
 
         raise HTTPException(status_code=200, detail="Password Successfully Updated")
 
@@ -0,0 +1,64 @@
+"""Amenity extraction from free-text facility columns: negation, ambiguous short words and whole-entry aliases."""
+import pytest
+from fastapi import HTTPException
+from services.amenities import extract_amenities, parse_amenity_terms
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("No parking", []),
+    ("without AC", []),
+    ("no gen", []),
+    ("Non-ensuite rooms", []),
+    ("not fenced", []),
+    ("Lacks a borehole", []),
+    ("Without any parking, borehole", ["borehole"]),
+    ("Parking; no generator", ["parking"]),
+    ("No smoking, swimming pool", ["swimming_pool"]),
+    # Only one word may sit between the negation and the amenity.
+    ("Not far from the gym", ["gym"]),
+])
+def test_negated_mentions(text, expected):
+    assert extract_amenities(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Pool table in the lounge", []),
+    ("Solar heater", ["solar"]),
+    ("Close to the generation plant", []),
+    ("Popular area", []),
+    ("Tiled roof and painted walls", []),
+    ("Access road is tarred", []),
+    ("AC in all rooms", ["air_conditioning"]),
+    ("Swimming pool and gym", ["gym", "swimming_pool"]),
+    ("Prepaid meter", ["prepaid_meter"]),
+    ("24/7 security with CCTV", ["cctv", "security"]),
+])
+def test_ambiguous_short_words(text, expected):
+    assert extract_amenities(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Borehole, Pool, Gen", ["borehole", "generator", "swimming_pool"]),
+    ("P.O.P.", ["pop_ceiling"]),
+    ("Tiles; heater", ["tiled_floors", "water_heater"]),
+    ("pool\ngen", ["generator", "swimming_pool"]),
+    ("Pool", ["swimming_pool"]),
+    ("Big pool", []),
+])
+def test_entry_aliases(text, expected):
+    assert extract_amenities(text) == expected
+
+
+def test_columns_are_combined():
+    assert extract_amenities("Borehole", None, "", "Gated estate, no lift") == ["borehole", "gated"]
+
+
+def test_filter_terms_accept_synonyms_and_entry_aliases():
+    assert parse_amenity_terms("Pool, gen,wi-fi,swimming_pool", "amenities") == ["generator", "internet", "swimming_pool"]
+
+
+def test_unknown_filter_term_is_a_400():
+    with pytest.raises(HTTPException) as error:
+        parse_amenity_terms("parking,jacuzzi", "any_amenities")
+    assert error.value.status_code == 400
+    assert "'jacuzzi'" in error.value.detail
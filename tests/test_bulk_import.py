@@ -0,0 +1,70 @@
+"""CSV/NDJSON record splitting for bulk imports: stray quotes, multi-line fields and length caps."""
+import asyncio
+import pytest
+import services.bulk_import
+from services.bulk_import import RecordError, RecordSplitter, iter_csv_records, iter_ndjson_records
+
+
+def collect(records, *chunks):
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+
+    async def run():
+        return [(line_no, str(record) if isinstance(record, RecordError) else record) async for line_no, record in records(stream())]
+
+    return asyncio.run(run())
+
+
+def test_inch_marks_are_literal():
+    rows = collect(iter_csv_records, b'title,address,price\n5" TV,Lagos,100\n3" pipe,Abuja,200\n')
+    assert rows == [
+        (2, {"title": '5" TV', "address": "Lagos", "price": "100"}),
+        (3, {"title": '3" pipe', "address": "Abuja", "price": "200"}),
+    ]
+
+
+def test_quoted_field_spans_lines():
+    rows = collect(iter_csv_records, b'title,description,price\n"Flat","two\nbed, ""ensuite""\nrooms",100\nDuplex,big,200\n')
+    assert rows == [
+        (2, {"title": "Flat", "description": 'two\nbed, "ensuite"\nrooms', "price": "100"}),
+        (5, {"title": "Duplex", "description": "big", "price": "200"}),
+    ]
+
+
+def test_chunk_boundaries_do_not_matter():
+    data = b'title,description\n"Flat","one\ntwo"\nDuplex,x\n'
+    whole = collect(iter_csv_records, data)
+    assert collect(iter_csv_records, *(data[i:i + 1] for i in range(len(data)))) == whole
+
+
+def test_malformed_row_is_a_row_error():
+    rows = collect(iter_csv_records, b'title,price\nFlat\r1,100\nDuplex,200\n')
+    assert rows[0][0] == 2 and rows[0][1].startswith("Invalid CSV")
+    assert rows[1] == (3, {"title": "Duplex", "price": "200"})
+
+
+def test_unterminated_quote_fails_only_its_row(monkeypatch):
+    monkeypatch.setattr(services.bulk_import, "BULK_MAX_RECORD_CHARS", 40)
+    rows = collect(iter_csv_records, b'title,price\n"Flat,100\n' + b"".join(b"Duplex %d,200\n" % n for n in range(10)))
+    assert rows[0] == (2, "Unterminated quoted field")
+    assert [line_no for line_no, _ in rows[1:]] == list(range(3, 13))
+    assert rows[1][1] == {"title": "Duplex 0", "price": "200"}
+
+
+def test_unterminated_quote_at_end_of_file():
+    splitter = RecordSplitter()
+    assert splitter.feed(1, "a,b") == [(1, "a,b")]
+    assert splitter.feed(2, '"open,1') == []
+    assert splitter.feed(3, "c,2") == []
+    assert [(line_no, str(text)) for line_no, text in splitter.finish()] == [(2, "Unterminated quoted field"), (3, "c,2")]
+
+
+@pytest.mark.parametrize("records", [iter_csv_records, iter_ndjson_records])
+def test_over_long_line_is_skipped(monkeypatch, records):
+    monkeypatch.setattr(services.bulk_import, "BULK_MAX_RECORD_CHARS", 20)
+    header = b"title,price\n" if records is iter_csv_records else b""
+    good = b"Flat,100\n" if records is iter_csv_records else b'{"title":"Flat"}\n'
+    rows = collect(records, header, b"x" * 15, b"x" * 15, b"x" * 15 + b"\n", good)
+    assert rows[0][1] == "Line longer than 20 characters"
+    assert len(rows) == 2 and not isinstance(rows[1][1], str)
@@ -0,0 +1,127 @@
+"""The Google OAuth callback against httpx.MockTransport fakes of the token and profile endpoints.
+
+The database is replaced by a recording connection, so no Postgres is needed.
+"""
+import jwt
+import httpx
+import pytest
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import routers.users
+from deps import SECRET_KEY, ALGORITHM, user_invalidations
+from services.google_oauth import google_oauth
+
+
+class FakeCursor:
+    def __init__(self, row):
+        self.row = row
+
+    async def fetchone(self):
+        return self.row
+
+
+class FakeConnection:
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, query, params=None):
+        self.statements.append((" ".join(query.split()), params))
+        return FakeCursor((1,))
+
+
+def google(token_response, requests):
+    async def handler(request: httpx.Request):
+        requests.append(request)
+        if request.url.path == "/token":
+            return token_response(request)
+        if request.url.path == "/userinfo/v2/me":
+            return httpx.Response(200, json={"email": "ada@gmail.com", "name": "Ada Obi"})
+        if request.url.path == "/v1/people/me":
+            return httpx.Response(200, json={"phoneNumbers": [{"value": "8012345678"}]})
+        return httpx.Response(404)
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    conn = FakeConnection()
+
+    @asynccontextmanager
+    async def get_connection():
+        yield conn
+
+    monkeypatch.setattr(routers.users, "get_connection", get_connection)
+    return conn
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(routers.users.usersrouter)
+    yield TestClient(app)
+    google_oauth.client = None
+
+
+def test_callback_upserts_user_and_issues_token(client, conn):
+    requests = []
+    google_oauth.client = google(lambda request: httpx.Response(200, json={"access_token": "google-token", "token_type": "Bearer"}), requests)
+
+    response = client.get("/auth/callback", params={"code": "auth-code", "state": "User"})
+
+    assert response.status_code == 200
+    token_request = requests[0]
+    assert token_request.method == "POST"
+    form = dict(httpx.QueryParams(token_request.content.decode()))
+    assert form["code"] == "auth-code"
+    assert form["grant_type"] == "authorization_code"
+    assert all(request.headers["authorization"] == "Bearer google-token" for request in requests[1:])
+
+    [(query, params)] = conn.statements
+    assert query.startswith("INSERT INTO Users") and "ON CONFLICT (email) DO NOTHING" in query
+    assert params == ("Ada Obi", "ada@gmail.com", "08012345678", True, "User")
+    assert "ada@gmail.com" in user_invalidations
+    claims = jwt.decode(response.json()["access_token"], SECRET_KEY, algorithms=[ALGORITHM])
+    assert claims["sub"] == "ada@gmail.com"
+
+
+def test_token_exchange_error_is_reported(client, conn):
+    requests = []
+    google_oauth.client = google(lambda request: httpx.Response(400, json={"error": "invalid_grant"}), requests)
+
+    response = client.get("/auth/callback", params={"code": "expired-code", "state": "User"})
+
+    assert response.status_code == 500
+    assert response.json()["detail"].startswith("OAuth token fetch failed")
+    assert len(requests) == 1
+    assert conn.statements == []
+
+
+def test_token_exchange_timeout_is_reported(client, conn):
+    def timeout(request):
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    google_oauth.client = google(timeout, [])
+
+    response = client.get("/auth/callback", params={"code": "auth-code", "state": "User"})
+
+    assert response.status_code == 500
+    assert "timed out" in response.json()["detail"]
+    assert conn.statements == []
+
+
+@pytest.mark.parametrize("payload, detail", [
+    ({"error": "invalid_grant", "error_description": "Bad Request"}, "Bad Request"),
+    ({"token_type": "Bearer"}, "unexpected response"),
+    ([], "unexpected response"),
+])
+def test_token_response_without_access_token_is_rejected(client, conn, payload, detail):
+    requests = []
+    google_oauth.client = google(lambda request: httpx.Response(200, json=payload), requests)
+
+    response = client.get("/auth/callback", params={"code": "auth-code", "state": "User"})
+
+    assert response.status_code == 502
+    assert response.json()["detail"] == f"OAuth token response had no access token: {detail}"
+    assert len(requests) == 1
+    assert conn.statements == []
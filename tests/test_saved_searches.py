@@ -0,0 +1,85 @@
+"""SearchIndex bucketing against the exact search_matches predicate: price bands, open ranges and NULL prices."""
+import itertools
+import pytest
+from services.saved_searches import MAX_BAND, SearchIndex, price_band, search_matches
+
+EDGE_PRICES = [None, 0, 1, 2, 3, 4, 255, 256, 257, 2**20 - 1, 2**20, 2**20 + 1, 2**47 - 1, 2**47, 2**47 + 1, 2**60]
+
+
+def search(id, min_price=None, max_price=None, **fields):
+    return {"id": id, "user_email": "ada@example.com", "name": f"search {id}", "min_price": min_price, "max_price": max_price,
+            "bedroom_no": None, "property_type": None, "purpose": None, "location": None, **fields}
+
+
+def building(price, **fields):
+    return {"id": 1, "price": price, "bedroom_no": "2", "property_type": "Flat", "purpose": "Rent", "address": "3 Admiralty Way, Lekki", **fields}
+
+
+@pytest.mark.parametrize("price, band", [
+    (None, 0),
+    (-5, 0),
+    (0, 0),
+    (1, 1),
+    (255, 8),
+    (256, 9),
+    (2**47 - 1, 47),
+    (2**47, MAX_BAND),
+    (2**60, MAX_BAND),
+])
+def test_price_band(price, band):
+    assert price_band(price) == band
+
+
+def test_null_price_only_matches_searches_without_price_bounds():
+    listing = building(None)
+    assert search_matches(search(1), listing)
+    assert not search_matches(search(2, min_price=0), listing)
+    assert not search_matches(search(3, max_price=10**9), listing)
+    assert not search_matches(search(4, min_price=0, max_price=10**9), listing)
+
+
+def test_open_ended_ranges():
+    index = SearchIndex()
+    index.add(search(1, min_price=1000))
+    index.add(search(2, max_price=1000))
+    assert [s["id"] for s in index.match(building(2**60))] == [1]
+    assert [s["id"] for s in index.match(building(0))] == [2]
+    assert sorted(s["id"] for s in index.match(building(1000))) == [1, 2]
+
+
+def test_index_agrees_with_predicate_at_band_edges():
+    bounds = [price for price in EDGE_PRICES if price is not None]
+    searches = [search(n, low, high) for n, (low, high) in enumerate(itertools.product([None, *bounds], repeat=2)) if low is None or high is None or low <= high]
+    index = SearchIndex()
+    for s in searches:
+        index.add(s)
+    for price in EDGE_PRICES:
+        listing = building(price)
+        assert sorted(s["id"] for s in index.match(listing)) == [s["id"] for s in searches if search_matches(s, listing)], price
+
+
+def test_index_agrees_with_predicate_on_fields():
+    searches = [
+        search(1, property_type="Flat"),
+        search(2, property_type="Duplex"),
+        search(3, purpose="Rent", bedroom_no="2"),
+        search(4, purpose="Sale"),
+        search(5, location="lekki", max_price=500),
+        search(6, location="yaba"),
+    ]
+    index = SearchIndex()
+    for s in searches:
+        index.add(s)
+    listing = building(400)
+    assert sorted(s["id"] for s in index.match(listing)) == [1, 3, 5]
+    assert sorted(s["id"] for s in index.match({**listing, "property_type": None})) == [3, 5]
+
+
+def test_remove_and_replace():
+    index = SearchIndex()
+    index.add(search(1, min_price=10, max_price=20))
+    index.add(search(1, min_price=100, max_price=200))
+    assert index.match(building(15)) == []
+    assert [s["id"] for s in index.match(building(150))] == [1]
+    index.remove(1)
+    assert len(index) == 0 and not index.buckets